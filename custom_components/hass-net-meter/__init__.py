@@ -6,19 +6,23 @@ import logging
 import async_timeout
 import voluptuous as vol
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Any
 
 from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
 from homeassistant.const import (
     CONF_NAME,
     Platform,
 )
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
-from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
+from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady, HomeAssistantError
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
@@ -32,14 +36,52 @@ from .const import (
     RoysNetMeter,
     DATA_KEY_API,
     DATA_KEY_COORDINATOR,
-    MIN_TIME_BETWEEN_UPDATES,
+    DATA_KEY_SCHEDULER,
+    STORAGE_VERSION,
+    SERVICE_BACKFILL,
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_START,
+    ATTR_END,
+    SERVICE_DUMP_TRACE,
+    ATTR_MINUTES,
+    ATTR_FILENAME,
+    DEFAULT_TRACE_MINUTES,
+    CONF_UPDATE_MODE,
+    CONF_COALESCE_INTERVAL,
+    UPDATE_MODES,
+    DEFAULT_UPDATE_MODE,
+    DEFAULT_COALESCE_INTERVAL,
+    CONF_POWER_DEADBAND,
+    CONF_MIN_PUBLISH_INTERVAL,
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_MIN_PUBLISH_INTERVAL,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
     GEN_AMP_ENTITY,
     CON_AMP_ENTITY,
     FLOW_POWER_ENTITY,
     FLOW_ENERGY_ENTITY,
     GEN_POWER_ENTITY,
-    GEN_ENERGY_ENTITY
+    GEN_ENERGY_ENTITY,
+    INPUT_ENTITIES,
+    FLOW_REACTIVE_POWER_ENTITY,
+    FLOW_REACTIVE_ENERGY_ENTITY,
+    REACTIVE_INPUT_ENTITIES,
+    CONF_PEAK_HOURS,
+    CONF_SHOULDER_HOURS,
+    CONF_HOLIDAYS,
+    CONF_EXTERNAL_STATISTICS,
+    DEFAULT_EXTERNAL_STATISTICS,
+    CONF_STALE_INPUT_TIMEOUT,
+    DEFAULT_STALE_INPUT_TIMEOUT,
 )
+from .backfill import async_backfill
+from .external_statistics import async_track_external_statistics
+from .scheduler import NetMeterScheduler, ScheduledMeter
+from .tariff import TariffSchedule, parse_holidays
+from .trace_buffer import TRACE_COLUMNS, write_trace
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -52,7 +94,20 @@ RoysNetMeter_SCHEMA = vol.Schema(
             vol.Required(FLOW_ENERGY_ENTITY, msg='Enter your flow energy entity', description='Enter your flow energy entity'): cv.string,
             vol.Required(GEN_POWER_ENTITY, msg='Enter your generation power entity', description='Enter your generation power entity'): cv.string,
             vol.Required(GEN_ENERGY_ENTITY, msg='Enter your generation energy entity', description='Enter your generation energy entity'): cv.string,
+            vol.Inclusive(FLOW_REACTIVE_POWER_ENTITY, 'reactive', msg='Enter both your flow reactive power and energy entities'): cv.string,
+            vol.Inclusive(FLOW_REACTIVE_ENERGY_ENTITY, 'reactive', msg='Enter both your flow reactive power and energy entities'): cv.string,
             vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
+            vol.Optional(CONF_UPDATE_MODE, default=DEFAULT_UPDATE_MODE): vol.In(UPDATE_MODES),
+            vol.Optional(CONF_COALESCE_INTERVAL, default=DEFAULT_COALESCE_INTERVAL): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_POWER_DEADBAND, default=DEFAULT_POWER_DEADBAND): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_MIN_PUBLISH_INTERVAL, default=DEFAULT_MIN_PUBLISH_INTERVAL): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_MIN_UPDATE_INTERVAL, default=DEFAULT_MIN_UPDATE_INTERVAL): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_MAX_UPDATE_INTERVAL, default=DEFAULT_MAX_UPDATE_INTERVAL): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_STALE_INPUT_TIMEOUT, default=DEFAULT_STALE_INPUT_TIMEOUT): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_PEAK_HOURS, default=[]): vol.All(cv.ensure_list, [vol.All(vol.Coerce(int), vol.Range(min=0, max=23))]),
+            vol.Optional(CONF_SHOULDER_HOURS, default=[]): vol.All(cv.ensure_list, [vol.All(vol.Coerce(int), vol.Range(min=0, max=23))]),
+            vol.Optional(CONF_HOLIDAYS, default=''): cv.string,
+            vol.Optional(CONF_EXTERNAL_STATISTICS, default=DEFAULT_EXTERNAL_STATISTICS): cv.boolean,
         },
     )
 )
@@ -65,11 +120,27 @@ CONFIG_SCHEMA = vol.Schema(
     extra=vol.ALLOW_EXTRA,
 )
 
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+    }
+)
+
+DUMP_TRACE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_MINUTES, default=DEFAULT_TRACE_MINUTES): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(ATTR_FILENAME): cv.string,
+    }
+)
+
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the Roy's Net Meter integration."""
 
-    hass.data[DOMAIN] = {}
+    hass.data[DOMAIN] = {DATA_KEY_SCHEDULER: NetMeterScheduler(hass)}
 
     # import
     if DOMAIN in config:
@@ -80,37 +151,84 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
                 )
             )
 
+    async def async_handle_backfill(call: ServiceCall) -> None:
+        """Recalculate the energy statistics from the recorded input history."""
+        # Statistics of the running hour are still compiled by the recorder.
+        end = dt_util.utcnow().replace(minute=0, second=0, microsecond=0)
+        if ATTR_END in call.data:
+            end = min(end, dt_util.as_utc(call.data[ATTR_END]))
+        start = dt_util.as_utc(call.data[ATTR_START])
+        entries = hass.data[DOMAIN]
+        for entry_id in _async_called_entry_ids(hass, call):
+            await async_backfill(hass, entries[entry_id][DATA_KEY_API], entry_id, start, end)
+
+    async def async_handle_dump_trace(call: ServiceCall) -> ServiceResponse:
+        """Write the latest calculations of the meters to a file, or return them."""
+        if ATTR_FILENAME not in call.data and not call.return_response:
+            raise HomeAssistantError(f"Give a {ATTR_FILENAME} or ask for the response")
+        start = (dt_util.utcnow() - timedelta(minutes=call.data[ATTR_MINUTES])).timestamp()
+        entries = hass.data[DOMAIN]
+        traces = {
+            entry_id: entries[entry_id][DATA_KEY_API].trace.since(start)
+            for entry_id in _async_called_entry_ids(hass, call)
+        }
+        if ATTR_FILENAME in call.data:
+            filename = hass.config.path(call.data[ATTR_FILENAME])
+            if not hass.config.is_allowed_path(filename):
+                raise HomeAssistantError(f"{filename} is not in an allowed directory")
+            await hass.async_add_executor_job(_write_trace_file, filename, traces)
+        if not call.return_response:
+            return None
+        return {
+            entry_id: {'columns': list(TRACE_COLUMNS), 'rows': rows.tolist()}
+            for entry_id, rows in traces.items()
+        }
+
+    hass.services.async_register(DOMAIN, SERVICE_BACKFILL, async_handle_backfill, schema=BACKFILL_SCHEMA)
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_DUMP_TRACE,
+        async_handle_dump_trace,
+        schema=DUMP_TRACE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Roy's Net Meter from a config entry."""
 
-    gen_amp_entity = entry.data[GEN_AMP_ENTITY]
-    con_amp_entity = entry.data[CON_AMP_ENTITY]
-    flow_power_entity = entry.data[FLOW_POWER_ENTITY]
-    flow_energy_entity = entry.data[FLOW_ENERGY_ENTITY]
-    gen_power_entity = entry.data[GEN_POWER_ENTITY]
-    gen_energy_entity = entry.data[GEN_ENERGY_ENTITY]
+    # Options override the data the entry was created with
+    config = {**entry.data, **entry.options}
+    flow_energy_entity = config[FLOW_ENERGY_ENTITY]
     name = entry.data[CONF_NAME]
-    api = RoysNetMeter(gen_amp_entity, con_amp_entity, flow_power_entity, flow_energy_entity, gen_power_entity, gen_energy_entity, hass)
-    if await api.authenticate():
-        hass.config_entries.async_update_entry(entry, unique_id=('roys-net-meter'))
-    else: raise ConfigEntryNotReady
-    
+    api = RoysNetMeter(*(config[key] for key in INPUT_ENTITIES), hass, *(config.get(key) for key in REACTIVE_INPUT_ENTITIES))
+    api.calculator.tariffs = _tariff_schedule(hass, config)
+    api.rollups.time_zone = dt_util.get_time_zone(hass.config.time_zone)
+    api.external_statistics = config.get(CONF_EXTERNAL_STATISTICS, DEFAULT_EXTERNAL_STATISTICS)
+    api.signal = f"{DOMAIN}_result_{entry.entry_id}"
+    # Entries created before multiple meters were supported all share one
+    # fixed unique ID, give them the ID new entries get from the flow.
+    if entry.unique_id in (None, 'roys-net-meter'):
+        hass.config_entries.async_update_entry(entry, unique_id=flow_energy_entity)
+    await api.async_restore(Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}"))
+
     async def async_update_data() -> None:
         """Fetch data from events endpoint.
 
         """
-        await api.perform_calculations()
+        if api.ready and await api.perform_calculations():
+            api.update_result()
 
 
+    # The coordinator never polls on its own, the shared scheduler runs the
+    # calculations of all meters and hands the results to the coordinators.
     coordinator = DataUpdateCoordinator(
         hass,
         _LOGGER,
         name=name,
         update_method=async_update_data,
-        update_interval=MIN_TIME_BETWEEN_UPDATES,
     )
 
     hass.data[DOMAIN][entry.entry_id] = {
@@ -120,17 +238,143 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     await hass.config_entries.async_forward_entry_setups(entry, _async_platforms(entry))
 
+    # The entities start out with the restored totals. Inputs of meters that
+    # connect late are waited for instead of retrying the whole setup.
+    scheduler: NetMeterScheduler = hass.data[DOMAIN][DATA_KEY_SCHEDULER]
+    meter = _scheduled_meter(api, coordinator, config)
+    if api.try_start():
+        scheduler.async_add(entry.entry_id, meter)
+    else:
+        _LOGGER.info('Waiting for the inputs of %s to report', name)
+        entry.async_on_unload(_async_start_when_ready(hass, entry.entry_id, scheduler, meter))
+    entry.async_on_unload(lambda: scheduler.async_remove(entry.entry_id))
+    if api.external_statistics:
+        entry.async_on_unload(async_track_external_statistics(hass, api, entry.entry_id, name))
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, _async_platforms(entry)):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        await data[DATA_KEY_API].async_save()
 
     return unload_ok
 
 
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options to a running meter.
+
+    The inputs, publish options and scheduling are swapped in place, so the
+    coordinator, the entities and the accumulated totals stay as they are.
+    """
+    config = {**entry.data, **entry.options}
+    data = hass.data[DOMAIN][entry.entry_id]
+    api: RoysNetMeter = data[DATA_KEY_API]
+    tariffs = _tariff_schedule(hass, config)
+    reactive = [config.get(key) for key in REACTIVE_INPUT_ENTITIES]
+    if (
+        not api.ready
+        or (tariffs is None) != (api.calculator.tariffs is None)
+        or (None not in reactive) != api.reactive
+        or config.get(CONF_EXTERNAL_STATISTICS, DEFAULT_EXTERNAL_STATISTICS) != api.external_statistics
+    ):
+        # Still waiting for the inputs, or the tariff or reactive sensors
+        # are added or removed, or the energy sensors move to or from
+        # external statistics, start over with the new options instead
+        hass.async_create_task(hass.config_entries.async_reload(entry.entry_id))
+        return
+    api.calculator.tariffs = tariffs
+    inputs = [config[key] for key in INPUT_ENTITIES]
+    if inputs + (reactive if api.reactive else []) != api.input_entities:
+        api.set_inputs(*inputs, *reactive)
+    scheduler: NetMeterScheduler = hass.data[DOMAIN][DATA_KEY_SCHEDULER]
+    scheduler.async_add(entry.entry_id, _scheduled_meter(api, data[DATA_KEY_COORDINATOR], config))
+
+
+@callback
+def _async_start_when_ready(hass: HomeAssistant, entry_id: str, scheduler: NetMeterScheduler, meter: ScheduledMeter) -> CALLBACK_TYPE:
+    """Start scheduling a meter once all its inputs have reported, return a callback to stop waiting."""
+    unsub: CALLBACK_TYPE | None = None
+
+    @callback
+    def _async_input_changed(_event: Event) -> None:
+        """Start the meter and stop listening once its inputs are ready."""
+        nonlocal unsub
+        if unsub is None or not meter.api.try_start():
+            return
+        unsub()
+        unsub = None
+        _LOGGER.info('Inputs of %s are ready after %.1f s', entry_id, meter.api.stats.startup_s)
+        scheduler.async_add(entry_id, meter)
+
+    @callback
+    def _async_stop_waiting() -> None:
+        """Stop listening if the meter never started."""
+        nonlocal unsub
+        if unsub is not None:
+            unsub()
+            unsub = None
+
+    unsub = async_track_state_change_event(hass, meter.api.input_entities, _async_input_changed)
+    return _async_stop_waiting
+
+
+@callback
+def _async_called_entry_ids(hass: HomeAssistant, call: ServiceCall) -> list[str]:
+    """Return the IDs of the loaded config entries a service call is for."""
+    entries = hass.data[DOMAIN]
+    entry_ids = [entry.entry_id for entry in hass.config_entries.async_entries(DOMAIN) if entry.entry_id in entries]
+    if ATTR_CONFIG_ENTRY_ID in call.data:
+        if call.data[ATTR_CONFIG_ENTRY_ID] not in entry_ids:
+            raise HomeAssistantError(f"{call.data[ATTR_CONFIG_ENTRY_ID]} is not a loaded {DOMAIN} config entry")
+        entry_ids = [call.data[ATTR_CONFIG_ENTRY_ID]]
+    return entry_ids
+
+
+def _write_trace_file(filename: str, traces: dict[str, Any]) -> None:
+    """Write the traces of the meters to a CSV file."""
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        write_trace(file, traces)
+
+
+def _tariff_schedule(hass: HomeAssistant, config: dict[str, Any]) -> TariffSchedule | None:
+    """Return the tariff schedule of a config, or None if it has no peak or shoulder hours."""
+    peak_hours = config.get(CONF_PEAK_HOURS, [])
+    shoulder_hours = config.get(CONF_SHOULDER_HOURS, [])
+    if not peak_hours and not shoulder_hours:
+        return None
+    return TariffSchedule(
+        peak_hours,
+        shoulder_hours,
+        parse_holidays(config.get(CONF_HOLIDAYS, '')),
+        dt_util.get_time_zone(hass.config.time_zone),
+    )
+
+
+def _scheduled_meter(api: RoysNetMeter, coordinator: DataUpdateCoordinator, config: dict[str, Any]) -> ScheduledMeter:
+    """Apply the publish options of a config to a meter and return how to schedule it."""
+    api.power_deadband = config.get(CONF_POWER_DEADBAND, DEFAULT_POWER_DEADBAND)
+    api.min_publish_interval = config.get(CONF_MIN_PUBLISH_INTERVAL, DEFAULT_MIN_PUBLISH_INTERVAL)
+    api.stale_input_timeout = config.get(CONF_STALE_INPUT_TIMEOUT, DEFAULT_STALE_INPUT_TIMEOUT)
+    min_interval = config.get(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL)
+    return ScheduledMeter(
+        api,
+        coordinator,
+        config.get(CONF_UPDATE_MODE, DEFAULT_UPDATE_MODE),
+        config.get(CONF_COALESCE_INTERVAL, DEFAULT_COALESCE_INTERVAL),
+        min_interval,
+        max(min_interval, config.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL)),
+    )
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored totals of a deleted config entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}").async_remove()
+
+
 # TODO List the platforms that you want to support.
 # For your initial PR, limit it to 1 platform.
 @callback
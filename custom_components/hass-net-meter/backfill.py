@@ -0,0 +1,166 @@
+"""Backfill of the energy statistics from the recorded input history."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from functools import partial
+import logging
+
+import numpy as np
+
+from homeassistant.components.recorder import get_instance, history
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_import_statistics,
+    get_last_statistics,
+    statistics_during_period,
+)
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import HomeAssistant, State
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, ENERGY_KEYS, SENSOR_TYPES, RoysNetMeter
+from .series import align_inputs, calculate_energy, filter_counter, hourly_totals
+from .stats import NetMeterStats
+
+_LOGGER = logging.getLogger(__name__)
+
+BACKFILL_CHUNK = timedelta(days=7)
+# How far back the statistic the imported sums continue from is looked for
+STATISTICS_LOOKBACK = timedelta(days=3 * 365)
+STATISTICS_WINDOW = timedelta(days=30)
+# Indexes of the flow and generation energy counters among the inputs
+COUNTER_INPUTS = (3, 5)
+
+
+def _append_states(times: list[float], values: list[float], states: list[State]) -> None:
+    """Append the numeric states of an input to its series."""
+    for state in states:
+        try:
+            value = float(state.state)
+        except ValueError:
+            continue
+        times.append(state.last_updated.timestamp())
+        values.append(value)
+
+
+def _last_statistic_before(hass: HomeAssistant, statistic_id: str, before: datetime) -> tuple[float, float] | None:
+    """Return the state and sum of the last hourly statistic that starts before before.
+
+    Runs in the recorder executor. None if there is none in the
+    STATISTICS_LOOKBACK before it.
+    """
+    last = get_last_statistics(hass, 1, statistic_id, False, {'state', 'sum'}).get(statistic_id)
+    if not last:
+        return None
+    if last[0]['start'] < before.timestamp():
+        return last[0]['state'] or 0.0, last[0]['sum'] or 0.0
+    window_end = before
+    while window_end > before - STATISTICS_LOOKBACK:
+        window_start = window_end - STATISTICS_WINDOW
+        rows = statistics_during_period(hass, window_start, window_end, {statistic_id}, 'hour', None, {'state', 'sum'}).get(statistic_id)
+        if rows:
+            return rows[-1]['state'] or 0.0, rows[-1]['sum'] or 0.0
+        window_end = window_start
+    return None
+
+
+def _calculate_backfill(
+    hass: HomeAssistant, entity_ids: list[str], statistic_ids: dict[str, str], start: datetime, end: datetime, stats: NetMeterStats
+) -> tuple[int, list[tuple[str, list[StatisticData], float]]]:
+    """Recalculate the hourly statistics of the energy sensors from the input history.
+
+    Runs in the recorder executor. The history is fetched in chunks so only
+    a week of states is held at a time. The energy counters go through the
+    same counter checks as the live meter, which are counted in stats.
+    Returns the number of aligned samples, and per statistic ID the
+    statistics to import and how much the sums of the statistics from end
+    on must be adjusted by to continue from the imported ones.
+    """
+    times: list[list[float]] = [[] for _entity_id in entity_ids]
+    values: list[list[float]] = [[] for _entity_id in entity_ids]
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + BACKFILL_CHUNK, end)
+        states = history.get_significant_states(
+            hass,
+            chunk_start,
+            chunk_end,
+            entity_ids,
+            include_start_time_state=chunk_start == start,
+            significant_changes_only=False,
+            no_attributes=True,
+        )
+        for index, entity_id in enumerate(entity_ids):
+            _append_states(times[index], values[index], states.get(entity_id, []))
+        chunk_start = chunk_end
+
+    series = [(np.array(entity_times), np.array(entity_values)) for entity_times, entity_values in zip(times, values)]
+    for index in COUNTER_INPUTS:
+        entity_times, entity_values = series[index]
+        series[index] = entity_times, filter_counter(entity_times, entity_values, stats)
+    timeline, columns = align_inputs(series)
+    if timeline.size < 2:
+        return timeline.size, []
+    energy = dict(zip(ENERGY_KEYS, calculate_energy(columns)))
+
+    imports = []
+    for key, statistic_id in statistic_ids.items():
+        hours, totals = hourly_totals(timeline, energy[key], end.timestamp())
+        if hours.size == 0:
+            continue
+        # Continue from the state and sum of the hour before the first imported one
+        base_state, base_sum = _last_statistic_before(hass, statistic_id, dt_util.utc_from_timestamp(hours[0])) or (0.0, 0.0)
+        statistics = [
+            StatisticData(start=dt_util.utc_from_timestamp(hour), state=base_state + total, sum=base_sum + total)
+            for hour, total in zip(hours.tolist(), totals.tolist())
+        ]
+        # The statistics from end on continue from the sum they replace
+        _old_state, old_sum = _last_statistic_before(hass, statistic_id, end) or (0.0, 0.0)
+        imports.append((statistic_id, statistics, statistics[-1]['sum'] - old_sum))
+    return timeline.size, imports
+
+
+async def async_backfill(hass: HomeAssistant, api: RoysNetMeter, entry_id: str, start: datetime, end: datetime) -> None:
+    """Recalculate the energy statistics of a meter between start and end.
+
+    Both are rounded down to the hour. The imported statistics continue
+    from the ones before start, and the sums of the ones from end on are
+    adjusted to continue from the imported ones, so the energy dashboard
+    shows no jumps at either end.
+    """
+    start = start.replace(minute=0, second=0, microsecond=0)
+    end = end.replace(minute=0, second=0, microsecond=0)
+    # The reactive inputs do not take part in the energy split
+    registry = er.async_get(hass)
+    statistic_ids = {}
+    for description in SENSOR_TYPES:
+        if description.key not in ENERGY_KEYS:
+            continue
+        statistic_id = registry.async_get_entity_id('sensor', DOMAIN, f"{entry_id}/{description.name}")
+        if statistic_id is not None:
+            statistic_ids[description.key] = statistic_id
+
+    stats = NetMeterStats()
+    samples, imports = await get_instance(hass).async_add_executor_job(
+        partial(_calculate_backfill, hass, api.input_entities[:6], statistic_ids, start, end, stats)
+    )
+    if samples < 2:
+        _LOGGER.warning('Not enough recorded history to backfill %s between %s and %s', entry_id, start, end)
+        return
+    for statistic_id, statistics, adjustment in imports:
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=None,
+            source='recorder',
+            statistic_id=statistic_id,
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        )
+        async_import_statistics(hass, metadata, statistics)
+        if adjustment:
+            get_instance(hass).async_adjust_statistics(statistic_id, end, adjustment, UnitOfEnergy.KILO_WATT_HOUR)
+    _LOGGER.info(
+        'Backfilled %s from %d aligned samples, with %d counter resets, %d rollovers, %d impossible deltas and %d negative glitches',
+        entry_id, samples, stats.counter_resets, stats.counter_rollovers, stats.impossible_deltas, stats.negative_glitches,
+    )
@@ -0,0 +1,222 @@
+"""Net metering calculations for the Roy's Net Meter integration.
+
+Nothing in here depends on Home Assistant, so recorded history can be
+replayed through the same logic the live sensors use.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from math import hypot
+from typing import NamedTuple
+
+from .model import NetMeterSensors, NetMeterState, NetMeterTariffSensors
+from .tariff import TARIFF_FIELDS, TariffSchedule
+
+
+class NetMeterSample(NamedTuple):
+    """Values of the six input entities at one point in time."""
+
+    gen_amp: float
+    con_amp: float
+    flow_power: float
+    flow_energy: float
+    gen_power: float
+    gen_energy: float
+    timestamp: float | None = None
+
+
+class NetMeterOutput(NamedTuple):
+    """Values of the sensors after a sample was calculated."""
+
+    consumption_power: float
+    import_power: float
+    export_power: float
+    consumption_energy: float
+    import_energy: float
+    export_energy: float
+
+
+class NetMeterCalculator:
+    """Split the net flow through the meter into consumption, import and export.
+
+    The flow energy only changes in whole meter increments, so a delta can
+    span the moment generation crosses consumption. When samples carry a
+    timestamp, the signed flow power is integrated between flow energy
+    changes, and a delta spanning a crossover is split between import and
+    export in proportion to the interpolated power on either side of it.
+    The integration only looks at the previous sample, so every update costs
+    the same. With a tariff schedule, the energy deltas of a timestamped
+    sample are also added to the tariff in force at its timestamp.
+    """
+
+    __slots__ = ('state', 'sensors', 'tariff_sensors', 'tariffs', 'seeded')
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.state = NetMeterState()
+        self.sensors = NetMeterSensors()
+        self.tariff_sensors = NetMeterTariffSensors()
+        self.tariffs: TariffSchedule | None = None
+        self.seeded = False
+
+    def seed(self, flow_energy: float, gen_energy: float, reactive_energy: float = 0.0) -> None:
+        """Set the meter readings the first energy deltas are taken against."""
+        state = self.state
+        state.flow_energy = flow_energy
+        state.generation_energy = gen_energy
+        state.reactive_energy = reactive_energy
+        # The integrated flow power belongs to the previous readings
+        state.last_timestamp = None
+        state.import_area = state.export_area = 0.0
+        self.seeded = True
+
+    def update(self, gen_amp: float, con_amp: float, flow_power: float, flow_energy: float, gen_power: float, gen_energy: float, timestamp: float | None = None) -> None:
+        """Calculate the sensors for one set of input values, sampled at timestamp (in seconds)."""
+        state = self.state
+        sensors = self.sensors
+        totals = (sensors.consumption_energy, sensors.import_energy, sensors.export_energy)
+        # Generation is more than consumption
+        if gen_amp > con_amp:
+            # Calculate power
+            flow_power = -1*flow_power
+            sensors.consumption_power = gen_power + flow_power
+            sensors.import_power = 0
+            sensors.export_power = -1*flow_power
+            if timestamp is not None:
+                self._integrate(flow_power, timestamp)
+            # Calculate energy
+            flow_delta = flow_energy - state.flow_energy
+            if flow_delta and state.import_area > 0:
+                self._split_crossover(flow_delta, gen_energy - state.generation_energy, True)
+            else:
+                if gen_energy == state.generation_energy:
+                    state.transient_flow_energy = state.transient_flow_energy - flow_delta
+                else:
+                    sensors.consumption_energy = sensors.consumption_energy + ((gen_energy - state.generation_energy) - flow_delta) + state.transient_flow_energy
+                    state.transient_flow_energy = 0
+                sensors.export_energy = sensors.export_energy + flow_delta
+        # Consumption is more than generation
+        else:
+            # Calculate power
+            sensors.consumption_power = gen_power + flow_power
+            sensors.import_power = flow_power
+            sensors.export_power = 0
+            if timestamp is not None:
+                self._integrate(flow_power, timestamp)
+            # Calculate energy
+            flow_delta = flow_energy - state.flow_energy
+            gen_delta = gen_energy - state.generation_energy
+            if flow_delta and state.export_area > 0:
+                self._split_crossover(flow_delta, gen_delta, False)
+            else:
+                if state.transient_flow_energy == 0:
+                    sensors.consumption_energy = sensors.consumption_energy + gen_delta + flow_delta
+                elif abs(gen_delta + flow_delta) > abs(state.transient_flow_energy):
+                    sensors.consumption_energy = sensors.consumption_energy + gen_delta + flow_delta + state.transient_flow_energy
+                    state.transient_flow_energy = 0
+                sensors.import_energy = sensors.import_energy + flow_delta
+        if flow_delta:
+            state.import_area = state.export_area = 0.0
+        state.flow_energy = flow_energy
+        state.generation_energy = gen_energy
+        if self.tariffs is not None and timestamp is not None:
+            self._accumulate_tariff(timestamp, totals)
+
+    def update_reactive(self, exporting: bool, flow_power: float, reactive_power: float, reactive_energy: float) -> None:
+        """Calculate the reactive sensors, in the direction update found the flow in."""
+        state = self.state
+        sensors = self.sensors
+        reactive_delta = reactive_energy - state.reactive_energy
+        if exporting:
+            sensors.reactive_import_power = 0
+            sensors.reactive_export_power = reactive_power
+            sensors.reactive_export_energy = sensors.reactive_export_energy + reactive_delta
+        else:
+            sensors.reactive_import_power = reactive_power
+            sensors.reactive_export_power = 0
+            sensors.reactive_import_energy = sensors.reactive_import_energy + reactive_delta
+        apparent_power = hypot(flow_power, reactive_power)
+        sensors.power_factor = abs(flow_power) / apparent_power if apparent_power else 1.0
+        state.reactive_energy = reactive_energy
+
+    def _accumulate_tariff(self, timestamp: float, totals: tuple[float, float, float]) -> None:
+        """Add the energy accumulated since totals to the tariff in force at timestamp."""
+        sensors = self.sensors
+        tariff_sensors = self.tariff_sensors
+        deltas = (
+            sensors.consumption_energy - totals[0],
+            sensors.import_energy - totals[1],
+            sensors.export_energy - totals[2],
+        )
+        for field, delta in zip(TARIFF_FIELDS[self.tariffs.tariff_at(timestamp)], deltas):
+            if delta:
+                setattr(tariff_sensors, field, getattr(tariff_sensors, field) + delta)
+
+    def _integrate(self, power: float, timestamp: float) -> None:
+        """Add the signed flow power since the previous sample to the import and export areas."""
+        state = self.state
+        last_timestamp = state.last_timestamp
+        last_power = state.last_power
+        state.last_timestamp = timestamp
+        state.last_power = power
+        if last_timestamp is None or timestamp <= last_timestamp:
+            return
+        duration = timestamp - last_timestamp
+        if (last_power >= 0) == (power >= 0):
+            area = (last_power + power) / 2 * duration
+            if power >= 0:
+                state.import_area += area
+            else:
+                state.export_area -= area
+            return
+        # The power changes sign, split the segment where it interpolates to zero
+        crossing = last_power / (last_power - power) * duration
+        before = abs(last_power) * crossing / 2
+        after = abs(power) * (duration - crossing) / 2
+        if last_power >= 0:
+            state.import_area += before
+            state.export_area += after
+        else:
+            state.export_area += before
+            state.import_area += after
+
+    def _split_crossover(self, flow_delta: float, gen_delta: float, exporting: bool) -> None:
+        """Split a flow energy delta that spans a crossover between import and export."""
+        state = self.state
+        sensors = self.sensors
+        import_delta = flow_delta * state.import_area / (state.import_area + state.export_area)
+        export_delta = flow_delta - import_delta
+        sensors.import_energy = sensors.import_energy + import_delta
+        sensors.export_energy = sensors.export_energy + export_delta
+        # Consumption follows the same carry rules as the uninterpolated deltas
+        if exporting and gen_delta == 0:
+            state.transient_flow_energy = state.transient_flow_energy + import_delta - export_delta
+        else:
+            sensors.consumption_energy = sensors.consumption_energy + gen_delta + import_delta - export_delta + state.transient_flow_energy
+            state.transient_flow_energy = 0
+
+    def output(self) -> NetMeterOutput:
+        """Return the current sensor values."""
+        sensors = self.sensors
+        return NetMeterOutput(
+            sensors.consumption_power,
+            sensors.import_power,
+            sensors.export_power,
+            sensors.consumption_energy,
+            sensors.import_energy,
+            sensors.export_energy,
+        )
+
+    def replay(self, samples: Iterable[NetMeterSample]) -> Iterator[NetMeterOutput]:
+        """Calculate a sequence of samples and yield the sensor values after each one.
+
+        An unseeded calculator is seeded from the first sample, so its energy
+        deltas start at zero.
+        """
+        update = self.update
+        output = self.output
+        for sample in samples:
+            if not self.seeded:
+                self.seed(sample[3], sample[5])
+            update(*sample)
+            yield output()
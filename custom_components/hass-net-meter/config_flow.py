@@ -6,15 +6,23 @@ from typing import Any
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
     CONF_ACCESS_TOKEN,
     CONF_API_TOKEN,
     CONF_HOST,
-    CONF_NAME
+    CONF_NAME,
+    UnitOfElectricCurrent,
+    UnitOfEnergy,
+    UnitOfPower,
 )
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.selector import EntitySelector, EntitySelectorConfig
 
 from .const import (
     DOMAIN, 
@@ -23,13 +31,123 @@ from .const import (
     DATA_KEY_API,
     DATA_KEY_COORDINATOR,
     MIN_TIME_BETWEEN_UPDATES,
+    CONF_UPDATE_MODE,
+    CONF_COALESCE_INTERVAL,
+    UPDATE_MODES,
+    DEFAULT_UPDATE_MODE,
+    DEFAULT_COALESCE_INTERVAL,
+    CONF_POWER_DEADBAND,
+    CONF_MIN_PUBLISH_INTERVAL,
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_MIN_PUBLISH_INTERVAL,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
     GEN_AMP_ENTITY,
     CON_AMP_ENTITY,
     FLOW_POWER_ENTITY,
     FLOW_ENERGY_ENTITY,
     GEN_POWER_ENTITY,
-    GEN_ENERGY_ENTITY
+    GEN_ENERGY_ENTITY,
+    INPUT_ENTITIES,
+    FLOW_REACTIVE_POWER_ENTITY,
+    FLOW_REACTIVE_ENERGY_ENTITY,
+    REACTIVE_INPUT_ENTITIES,
+    UNIT_VAR,
+    UNIT_KILO_VAR_HOUR,
+    CONF_PEAK_HOURS,
+    CONF_SHOULDER_HOURS,
+    CONF_HOLIDAYS,
+    CONF_EXTERNAL_STATISTICS,
+    DEFAULT_EXTERNAL_STATISTICS,
+    CONF_STALE_INPUT_TIMEOUT,
+    DEFAULT_STALE_INPUT_TIMEOUT,
 )
+from .tariff import parse_holidays
+
+# Device class and unit every input entity must have
+INPUT_TYPES = {
+    GEN_AMP_ENTITY: (SensorDeviceClass.CURRENT, UnitOfElectricCurrent.AMPERE),
+    CON_AMP_ENTITY: (SensorDeviceClass.CURRENT, UnitOfElectricCurrent.AMPERE),
+    FLOW_POWER_ENTITY: (SensorDeviceClass.POWER, UnitOfPower.WATT),
+    FLOW_ENERGY_ENTITY: (SensorDeviceClass.ENERGY, UnitOfEnergy.KILO_WATT_HOUR),
+    GEN_POWER_ENTITY: (SensorDeviceClass.POWER, UnitOfPower.WATT),
+    GEN_ENERGY_ENTITY: (SensorDeviceClass.ENERGY, UnitOfEnergy.KILO_WATT_HOUR),
+}
+# Device class and unit of the optional reactive inputs, kVarh has no device class
+REACTIVE_INPUT_TYPES = {
+    FLOW_REACTIVE_POWER_ENTITY: (SensorDeviceClass.REACTIVE_POWER, UNIT_VAR),
+    FLOW_REACTIVE_ENERGY_ENTITY: (None, UNIT_KILO_VAR_HOUR),
+}
+
+
+HOURS = {str(hour): f"{hour:02d}:00" for hour in range(24)}
+
+
+def _meter_schema(defaults: dict[str, Any]) -> dict:
+    """Return the form fields of the inputs and update options of a meter."""
+    schema = {
+        vol.Required(key, default=defaults.get(key, vol.UNDEFINED)): EntitySelector(
+            EntitySelectorConfig(domain="sensor", device_class=device_class)
+        )
+        for key, (device_class, _unit) in INPUT_TYPES.items()
+    }
+    for key, (device_class, _unit) in REACTIVE_INPUT_TYPES.items():
+        schema[vol.Optional(key, description={"suggested_value": defaults.get(key)})] = EntitySelector(
+            EntitySelectorConfig(domain="sensor", device_class=device_class) if device_class else EntitySelectorConfig(domain="sensor")
+        )
+    for key, default in (
+        (CONF_COALESCE_INTERVAL, DEFAULT_COALESCE_INTERVAL),
+        (CONF_POWER_DEADBAND, DEFAULT_POWER_DEADBAND),
+        (CONF_MIN_PUBLISH_INTERVAL, DEFAULT_MIN_PUBLISH_INTERVAL),
+        (CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL),
+        (CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL),
+        (CONF_STALE_INPUT_TIMEOUT, DEFAULT_STALE_INPUT_TIMEOUT),
+    ):
+        schema[vol.Required(key, default=defaults.get(key, default))] = vol.All(vol.Coerce(float), vol.Range(min=0))
+    schema[vol.Required(CONF_UPDATE_MODE, default=defaults.get(CONF_UPDATE_MODE, DEFAULT_UPDATE_MODE))] = vol.In(UPDATE_MODES)
+    # Weekday hours of the tariff schedule, the remaining hours are off-peak
+    for key in (CONF_PEAK_HOURS, CONF_SHOULDER_HOURS):
+        schema[vol.Optional(key, default=defaults.get(key, []))] = cv.multi_select(HOURS)
+    schema[vol.Optional(CONF_HOLIDAYS, default=defaults.get(CONF_HOLIDAYS, ''))] = str
+    schema[vol.Required(CONF_EXTERNAL_STATISTICS, default=defaults.get(CONF_EXTERNAL_STATISTICS, DEFAULT_EXTERNAL_STATISTICS))] = bool
+    return schema
+
+
+async def _async_validate_meter(hass: HomeAssistant, user_input: dict[str, Any], require_ready: bool = True) -> dict[str, str]:
+    """Check the inputs and options of a meter and return the form errors.
+
+    With require_ready, every input must also have a numeric state. A
+    running meter waits for inputs that are not ready yet, so the options
+    do not require it.
+    """
+    errors = {}
+    reactive = [user_input.get(key) for key in REACTIVE_INPUT_TYPES]
+    if None in reactive and reactive != [None, None]:
+        errors["base"] = "reactive_incomplete"
+    for key, (_device_class, unit) in (INPUT_TYPES | REACTIVE_INPUT_TYPES).items():
+        if (entity_id := user_input.get(key)) is None:
+            continue
+        state = hass.states.get(entity_id)
+        if state is None:
+            errors[key] = "entity_not_found"
+        elif state.attributes.get(ATTR_UNIT_OF_MEASUREMENT, unit) != unit:
+            errors[key] = "wrong_unit"
+    if user_input.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL) < user_input.get(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL):
+        errors[CONF_MAX_UPDATE_INTERVAL] = "max_below_min"
+    try:
+        parse_holidays(user_input.get(CONF_HOLIDAYS, ''))
+    except ValueError:
+        errors[CONF_HOLIDAYS] = "invalid_holidays"
+    if errors or not require_ready:
+        return errors
+    hub = RoysNetMeter(*(user_input[key] for key in INPUT_ENTITIES), hass, *reactive)
+    try:
+        await hub.authenticate()
+    except ConfigEntryNotReady:
+        errors["base"] = "inputs_not_ready"
+    return errors
 
 
 class RoysNetMeter_flow_handler(config_entries.ConfigFlow, domain=DOMAIN):
@@ -41,6 +159,14 @@ class RoysNetMeter_flow_handler(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize the config flow."""
         self._config: dict = {}
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """Get the options flow for this handler."""
+        return RoysNetMeter_options_flow_handler()
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -54,32 +180,33 @@ class RoysNetMeter_flow_handler(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
 
         if user_input is not None:
-            gen_amp_entity = user_input[GEN_AMP_ENTITY]
-            con_amp_entity = user_input[CON_AMP_ENTITY]
-            flow_power_entity = user_input[FLOW_POWER_ENTITY]
-            flow_energy_entity = user_input[FLOW_ENERGY_ENTITY]
-            gen_power_entity = user_input[GEN_POWER_ENTITY]
-            gen_energy_entity = user_input[GEN_ENERGY_ENTITY]
-            name = user_input[CONF_NAME]
-            
-            hub = RoysNetMeter(gen_amp_entity, con_amp_entity, flow_power_entity, flow_energy_entity, gen_power_entity, gen_energy_entity, self.hass)
-
-            if await hub.authenticate():
-                self._config[CONF_NAME] = name
-                self._config[GEN_AMP_ENTITY] = gen_amp_entity
-                self._config[CON_AMP_ENTITY] = con_amp_entity
-                self._config[FLOW_POWER_ENTITY] = flow_power_entity
-                self._config[FLOW_ENERGY_ENTITY] = flow_energy_entity
-                self._config[GEN_POWER_ENTITY] = gen_power_entity
-                self._config[GEN_ENERGY_ENTITY] = gen_energy_entity
+            errors = await _async_validate_meter(self.hass, user_input)
+            if not errors:
+                # A meter is identified by its net flow energy entity
+                await self.async_set_unique_id(user_input[FLOW_ENERGY_ENTITY])
+                self._abort_if_unique_id_configured()
+                self._config[CONF_NAME] = user_input[CONF_NAME]
+                for key in INPUT_ENTITIES:
+                    self._config[key] = user_input[key]
+                for key in REACTIVE_INPUT_ENTITIES:
+                    self._config[key] = user_input.get(key)
+                self._config[CONF_UPDATE_MODE] = user_input.get(CONF_UPDATE_MODE, DEFAULT_UPDATE_MODE)
+                self._config[CONF_COALESCE_INTERVAL] = user_input.get(CONF_COALESCE_INTERVAL, DEFAULT_COALESCE_INTERVAL)
+                self._config[CONF_POWER_DEADBAND] = user_input.get(CONF_POWER_DEADBAND, DEFAULT_POWER_DEADBAND)
+                self._config[CONF_MIN_PUBLISH_INTERVAL] = user_input.get(CONF_MIN_PUBLISH_INTERVAL, DEFAULT_MIN_PUBLISH_INTERVAL)
+                self._config[CONF_MIN_UPDATE_INTERVAL] = user_input.get(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL)
+                self._config[CONF_MAX_UPDATE_INTERVAL] = user_input.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL)
+                self._config[CONF_STALE_INPUT_TIMEOUT] = user_input.get(CONF_STALE_INPUT_TIMEOUT, DEFAULT_STALE_INPUT_TIMEOUT)
+                self._config[CONF_PEAK_HOURS] = user_input.get(CONF_PEAK_HOURS, [])
+                self._config[CONF_SHOULDER_HOURS] = user_input.get(CONF_SHOULDER_HOURS, [])
+                self._config[CONF_HOLIDAYS] = user_input.get(CONF_HOLIDAYS, '')
+                self._config[CONF_EXTERNAL_STATISTICS] = user_input.get(CONF_EXTERNAL_STATISTICS, DEFAULT_EXTERNAL_STATISTICS)
                 return self.async_create_entry(
                 title=self._config[CONF_NAME],
                 data={
                     **self._config,
                 },
                 )
-            else:
-                raise ConfigEntryAuthFailed
 
         user_input = user_input or {}
         return self.async_show_form(
@@ -89,31 +216,43 @@ class RoysNetMeter_flow_handler(config_entries.ConfigFlow, domain=DOMAIN):
                     vol.Required(
                         CONF_NAME, default=user_input.get(CONF_NAME, DEFAULT_NAME)
                     ): str,
-                    vol.Required(
-                        GEN_AMP_ENTITY,
-                        default=user_input.get(GEN_AMP_ENTITY, ''),
-                    ): str,
-                    vol.Required(
-                        CON_AMP_ENTITY,
-                        default=user_input.get(CON_AMP_ENTITY, ''),
-                    ): str,
-                    vol.Required(
-                        FLOW_POWER_ENTITY,
-                        default=user_input.get(FLOW_POWER_ENTITY, ''),
-                    ): str,
-                    vol.Required(
-                        FLOW_ENERGY_ENTITY,
-                        default=user_input.get(FLOW_ENERGY_ENTITY, ''),
-                    ): str,
-                    vol.Required(
-                        GEN_POWER_ENTITY,
-                        default=user_input.get(GEN_POWER_ENTITY, ''),
-                    ): str,
-                    vol.Required(
-                        GEN_ENERGY_ENTITY,
-                        default=user_input.get(GEN_ENERGY_ENTITY, ''),
-                    ): str,
+                    **_meter_schema(user_input),
                 }
             ),
             errors=errors,
         )
+
+
+class RoysNetMeter_options_flow_handler(config_entries.OptionsFlow):
+    """Handle the Roy's Net Meter options."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the inputs and update options of a meter."""
+        errors = {}
+
+        if user_input is not None:
+            errors = await _async_validate_meter(self.hass, user_input, require_ready=False)
+            flow_energy_entity = user_input[FLOW_ENERGY_ENTITY]
+            if not errors and flow_energy_entity != self.config_entry.unique_id:
+                if any(
+                    entry.unique_id == flow_energy_entity
+                    for entry in self.hass.config_entries.async_entries(DOMAIN)
+                ):
+                    errors[FLOW_ENERGY_ENTITY] = "already_configured"
+                else:
+                    # A meter is identified by its net flow energy entity
+                    self.hass.config_entries.async_update_entry(self.config_entry, unique_id=flow_energy_entity)
+            if not errors:
+                # Cleared reactive inputs must override the ones the entry was created with
+                for key in REACTIVE_INPUT_ENTITIES:
+                    user_input.setdefault(key, None)
+                return self.async_create_entry(title="", data=user_input)
+
+        current = {**self.config_entry.data, **self.config_entry.options, **(user_input or {})}
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(_meter_schema(current)),
+            errors=errors,
+        )
@@ -1,22 +1,34 @@
 """Constants for the Roy's Net Meter integration."""
 from __future__ import annotations
 
-from collections.abc import Callable
+from collections.abc import Callable, Sequence
 from typing import TYPE_CHECKING, Final
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, fields
+from operator import attrgetter
 from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
 import logging, asyncio
 import aiohttp
 import async_timeout
 from datetime import timedelta, datetime
+from time import monotonic, perf_counter, time
 from typing import Any
 from homeassistant.components.sensor import SensorEntityDescription, SensorDeviceClass, SensorStateClass
-from homeassistant.core import HomeAssistant
-from homeassistant.const import UnitOfEnergy, UnitOfPower, STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfEnergy, UnitOfPower, UnitOfTime, STATE_UNAVAILABLE
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.event import async_track_state_change_event, async_track_template_result
+from homeassistant.helpers.storage import Store
 from binascii import a2b_base64
 from json import loads, dumps
 
+from .calculator import NetMeterCalculator
+from .model import NetMeterResult, NetMeterTariffSensors
+from .quality import CounterFilter
+from .rollups import NetMeterRollups
+from .stats import NetMeterStats
+from .tariff import ENERGY_KINDS, TARIFFS
+from .trace_buffer import NetMeterTrace
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -24,13 +36,77 @@ DOMAIN: Final = 'roys-net-meter'
 DEFAULT_NAME: Final = "Roy's Net Meter"
 DATA_KEY_API: Final = 'api'
 DATA_KEY_COORDINATOR: Final = 'coordinator'
+DATA_KEY_SCHEDULER: Final = 'scheduler'
 GEN_AMP_ENTITY: Final = 'gen_amp_entity'
 CON_AMP_ENTITY: Final = 'con_amp_entity'
 FLOW_POWER_ENTITY: Final = 'flow_power_entity'
 FLOW_ENERGY_ENTITY: Final = 'flow_energy_entity'
 GEN_POWER_ENTITY: Final = 'gen_power_entity'
 GEN_ENERGY_ENTITY: Final = 'gen_energy_entity'
+FLOW_REACTIVE_POWER_ENTITY: Final = 'flow_reactive_power_entity'
+FLOW_REACTIVE_ENERGY_ENTITY: Final = 'flow_reactive_energy_entity'
+# Config keys of the input entities, in the order RoysNetMeter takes them
+INPUT_ENTITIES: Final = (GEN_AMP_ENTITY, CON_AMP_ENTITY, FLOW_POWER_ENTITY, FLOW_ENERGY_ENTITY, GEN_POWER_ENTITY, GEN_ENERGY_ENTITY)
+# Optional inputs, either both or none of them are set
+REACTIVE_INPUT_ENTITIES: Final = (FLOW_REACTIVE_POWER_ENTITY, FLOW_REACTIVE_ENERGY_ENTITY)
+UNIT_VAR: Final = 'var'
+UNIT_KILO_VAR_HOUR: Final = 'kvarh'
+CONF_UPDATE_MODE: Final = 'update_mode'
+CONF_COALESCE_INTERVAL: Final = 'coalesce_interval'
+UPDATE_MODE_PUSH: Final = 'push'
+UPDATE_MODE_POLL: Final = 'poll'
+UPDATE_MODES: Final = [UPDATE_MODE_PUSH, UPDATE_MODE_POLL]
+DEFAULT_UPDATE_MODE: Final = UPDATE_MODE_PUSH
+DEFAULT_COALESCE_INTERVAL: Final = 0.5
+CONF_POWER_DEADBAND: Final = 'power_deadband'
+CONF_MIN_PUBLISH_INTERVAL: Final = 'min_publish_interval'
+DEFAULT_POWER_DEADBAND: Final = 0.0
+DEFAULT_MIN_PUBLISH_INTERVAL: Final = 0.0
 MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=0.5)
+CONF_MIN_UPDATE_INTERVAL: Final = 'min_update_interval'
+CONF_MAX_UPDATE_INTERVAL: Final = 'max_update_interval'
+DEFAULT_MIN_UPDATE_INTERVAL: Final = MIN_TIME_BETWEEN_UPDATES.total_seconds()
+DEFAULT_MAX_UPDATE_INTERVAL: Final = 8.0
+# The update interval drops back to the minimum when the gen/con amp margin
+# is below ADAPTIVE_CROSSOVER_MARGIN amps or the flow power changed by more
+# than ADAPTIVE_POWER_CHANGE watts since the previous calculation.
+ADAPTIVE_CROSSOVER_MARGIN: Final = 1.0
+ADAPTIVE_POWER_CHANGE: Final = 100.0
+CONF_PEAK_HOURS: Final = 'peak_hours'
+CONF_SHOULDER_HOURS: Final = 'shoulder_hours'
+CONF_HOLIDAYS: Final = 'holidays'
+CONF_EXTERNAL_STATISTICS: Final = 'external_statistics'
+DEFAULT_EXTERNAL_STATISTICS: Final = False
+# Source of the external statistics, the domain is not a valid one
+STATISTICS_SOURCE: Final = 'roys_net_meter'
+# Keys of the energy sensors that long-term statistics are kept for
+ENERGY_KEYS: Final = ('consumption_energy', 'import_energy', 'export_energy')
+SERVICE_BACKFILL: Final = 'backfill'
+ATTR_CONFIG_ENTRY_ID: Final = 'config_entry_id'
+ATTR_START: Final = 'start'
+ATTR_END: Final = 'end'
+SERVICE_DUMP_TRACE: Final = 'dump_trace'
+ATTR_MINUTES: Final = 'minutes'
+ATTR_FILENAME: Final = 'filename'
+DEFAULT_TRACE_MINUTES: Final = 10.0
+# Calculations kept in the trace of every meter, about 1.7 MB
+TRACE_SIZE: Final = 16384
+# Debugging attributes of the sensors, see RoysNetMeter.result_attributes
+ATTR_LAST_DELTA: Final = 'last_delta'
+ATTR_DIRECTION: Final = 'direction'
+ATTR_AMP_MARGIN: Final = 'amp_margin'
+ATTR_TRANSIENT_CARRY: Final = 'transient_carry'
+ATTR_INPUTS_UPDATED: Final = 'inputs_updated'
+DEBUG_ATTRIBUTES: Final = frozenset({ATTR_LAST_DELTA, ATTR_DIRECTION, ATTR_AMP_MARGIN, ATTR_TRANSIENT_CARRY, ATTR_INPUTS_UPDATED})
+# Seconds after which an input that reported nothing is treated as
+# unavailable, off by default since some integrations do not report a flat
+# value again (like generation overnight)
+CONF_STALE_INPUT_TIMEOUT: Final = 'stale_input_timeout'
+DEFAULT_STALE_INPUT_TIMEOUT: Final = 0.0
+STORAGE_VERSION: Final = 1
+STORAGE_SAVE_DELAY: Final = 60
+
+_tariff_totals = attrgetter(*(field.name for field in fields(NetMeterTariffSensors)))
 
 def parse_sensor_state(state):
     """Parse the state of a sensor into open/closed/unavailable/unknown."""
@@ -44,12 +120,68 @@ def parse_sensor_state(state):
         except:
             raise ConfigEntryNotReady
 
+class InputSnapshot:
+    """Parsed values of the input entities at one point in time.
+
+    The states are looked up once per refresh, and an input is only parsed
+    again when the last_updated of its state changed. The timestamp is the
+    latest last_updated of the inputs, in seconds.
+    """
+
+    __slots__ = ('entity_ids', 'values', 'timestamp', '_last_updated', '_last_reported')
+
+    def __init__(self, entity_ids: list[str]) -> None:
+        """Initialize."""
+        self.entity_ids = tuple(entity_ids)
+        self.values = [0.0] * len(self.entity_ids)
+        self.timestamp = 0.0
+        self._last_updated: list[datetime | None] = [None] * len(self.entity_ids)
+        self._last_reported: list[datetime | None] = [None] * len(self.entity_ids)
+
+    def refresh(self, hass: HomeAssistant) -> int:
+        """Update the values from the current states and return how many inputs changed."""
+        get = hass.states.get
+        values = self.values
+        last_updated = self._last_updated
+        last_reported = self._last_reported
+        changed = 0
+        for index, entity_id in enumerate(self.entity_ids):
+            state = get(entity_id)
+            # Home Assistant 2024.3 and newer also tell when an unchanged state was reported
+            last_reported[index] = getattr(state, 'last_reported', None)
+            if state is not None and state.last_updated == last_updated[index]:
+                continue
+            values[index] = parse_sensor_state(state)
+            last_updated[index] = state.last_updated
+            timestamp = state.last_updated.timestamp()
+            if timestamp > self.timestamp:
+                self.timestamp = timestamp
+            changed += 1
+        return changed
+
+    def updated_at(self) -> dict[str, str | None]:
+        """Return when each input last changed, by entity ID."""
+        return {
+            entity_id: updated.isoformat() if updated is not None else None
+            for entity_id, updated in zip(self.entity_ids, self._last_updated)
+        }
+
+    def oldest_report(self) -> float | None:
+        """Return when the input reported longest ago was last reported, in seconds.
+
+        None if Home Assistant does not tell when states were reported.
+        """
+        if None in self._last_reported:
+            return None
+        return min(self._last_reported).timestamp()
+
+
 class RoysNetMeter:
     """Roy's Net Meter class to check configuration and get related entity info.
 
     """
 
-    def __init__(self, gen_amp_entity: str, con_amp_entity: str, flow_power_entity: str, flow_energy_entity: str, gen_power_entity: str, gen_energy_entity: str, hass: HomeAssistant) -> None:
+    def __init__(self, gen_amp_entity: str, con_amp_entity: str, flow_power_entity: str, flow_energy_entity: str, gen_power_entity: str, gen_energy_entity: str, hass: HomeAssistant, flow_reactive_power_entity: str | None = None, flow_reactive_energy_entity: str | None = None) -> None:
         """Initialize."""
         self.gen_amp_entity = gen_amp_entity
         self.con_amp_entity = con_amp_entity
@@ -57,119 +189,291 @@ class RoysNetMeter:
         self.flow_energy_entity = flow_energy_entity
         self.gen_power_entity = gen_power_entity
         self.gen_energy_entity = gen_energy_entity
+        self.flow_reactive_power_entity = flow_reactive_power_entity
+        self.flow_reactive_energy_entity = flow_reactive_energy_entity
         self.hass = hass
         self.loop = hass.loop
+        self.power_deadband = DEFAULT_POWER_DEADBAND
+        self.min_publish_interval = DEFAULT_MIN_PUBLISH_INTERVAL
+        self.external_statistics = DEFAULT_EXTERNAL_STATISTICS
+        self.stale_input_timeout = DEFAULT_STALE_INPUT_TIMEOUT
 
         self.event_listener = []
-        self.old_state = {}
-        self.new_state = {}
-        self.transient_state = {}
-        self.stale_state = {}
-
-        self.old_state['power'] = {}
-        self.old_state['energy'] = {}
-        self.old_state['power']['flow'] = 0
-        self.old_state['power']['generation'] = 0
-        self.old_state['power']['consumption'] = 0
-        self.old_state['energy']['flow'] = 0
-        self.old_state['energy']['generation'] = 0
-        self.old_state['energy']['consumption'] = 0
-        self.old_state['energy']['import'] = 0
-        self.old_state['energy']['export'] = 0
-        self.stale_state['energy'] = {}
-        self.stale_state['energy']['flow'] = 0
-        self.transient_state['power'] = {}
-        self.transient_state['energy'] = {}
-        self.transient_state['power']['flow'] = 0
-        self.transient_state['power']['generation'] = 0
-        self.transient_state['power']['consumption'] = 0
-        self.transient_state['energy']['flow'] = 0
-        self.transient_state['energy']['generation'] = 0
-        self.transient_state['energy']['consumption'] = 0
-        self.new_state['power'] = {}
-        self.new_state['energy'] = {}
-        self.new_state['power']['flow'] = 0
-        self.new_state['power']['generation'] = 0
-        self.new_state['power']['consumption'] = 0
-        self.new_state['energy']['flow'] = 0
-        self.new_state['energy']['generation'] = 0
-        self.new_state['energy']['consumption'] = 0
-        self.new_state['sensors'] = {}
-        self.new_state['sensors']['consumption_energy'] = 0
-        self.new_state['sensors']['import_energy'] = 0
-        self.new_state['sensors']['export_energy'] = 0
-        self.new_state['sensors']['consumption_power'] = 0
-        self.new_state['sensors']['import_power'] = 0
-        self.new_state['sensors']['export_power'] = 0
+        self._store: Store | None = None
+        self._saved_totals: tuple[float, ...] | None = None
+        self._save_scheduled = False
+        self.inputs = InputSnapshot(self.input_entities)
+        self._calculated = False
+        self.calculator = NetMeterCalculator()
+        self.state = self.calculator.state
+        self.sensors = self.calculator.sensors
+        self.tariff_sensors = self.calculator.tariff_sensors
+        self.stats = NetMeterStats()
+        self.rollups = NetMeterRollups()
+        self.trace = NetMeterTrace(TRACE_SIZE)
+        self.ready = False
+        self._stale = False
+        self.flow_energy_filter = CounterFilter(self.stats)
+        self.gen_energy_filter = CounterFilter(self.stats)
+        self.reactive_energy_filter = CounterFilter(self.stats)
+        # Set from the ID of the config entry when the entry is set up
+        self.signal = f"{DOMAIN}_result"
+        # Start of the UTC hour of the latest calculation, while the hourly
+        # external statistics are added
+        self.open_hour = 0.0
+        self.result_paths: tuple[str, ...] = ()
+        self._result_getter: Callable[[RoysNetMeter], tuple[float, ...]] = lambda _api: ()
+        self.result = NetMeterResult()
+        self.previous_result = self.result
+        self._attributes: dict[str, Any] = {}
+        self._attributes_generation = 0
+
+    def set_inputs(self, gen_amp_entity: str, con_amp_entity: str, flow_power_entity: str, flow_energy_entity: str, gen_power_entity: str, gen_energy_entity: str, flow_reactive_power_entity: str | None = None, flow_reactive_energy_entity: str | None = None) -> None:
+        """Swap the input entities while keeping the accumulated totals.
+
+        The next calculation seeds the calculator again from the new inputs,
+        so the first energy deltas are taken against the readings of the new
+        meters.
+        """
+        self.gen_amp_entity = gen_amp_entity
+        self.con_amp_entity = con_amp_entity
+        self.flow_power_entity = flow_power_entity
+        self.flow_energy_entity = flow_energy_entity
+        self.gen_power_entity = gen_power_entity
+        self.gen_energy_entity = gen_energy_entity
+        self.flow_reactive_power_entity = flow_reactive_power_entity
+        self.flow_reactive_energy_entity = flow_reactive_energy_entity
+        self.inputs = InputSnapshot(self.input_entities)
+        self._calculated = False
+        self.calculator.seeded = False
+        # The readings of the new meters are no delta of the old ones
+        self.rollups.rebaseline()
+        self.flow_energy_filter = CounterFilter(self.stats)
+        self.gen_energy_filter = CounterFilter(self.stats)
+        self.reactive_energy_filter = CounterFilter(self.stats)
+
+    @property
+    def input_entities(self) -> list[str]:
+        """Return the entity IDs the calculations depend on."""
+        entities = [self.gen_amp_entity, self.con_amp_entity, self.flow_power_entity, self.flow_energy_entity, self.gen_power_entity, self.gen_energy_entity]
+        if self.reactive:
+            entities += [self.flow_reactive_power_entity, self.flow_reactive_energy_entity]
+        return entities
+
+    @property
+    def reactive(self) -> bool:
+        """Return whether the reactive power and energy of the flow are measured."""
+        return self.flow_reactive_power_entity is not None and self.flow_reactive_energy_entity is not None
 
     async def authenticate(self) -> bool:
         """Test if we can get current states."""
         try:
-            if self.hass.states.get(self.gen_amp_entity) and self.hass.states.get(self.con_amp_entity) and self.hass.states.get(self.flow_power_entity) and self.hass.states.get(self.flow_energy_entity) and self.hass.states.get(self.gen_power_entity) and self.hass.states.get(self.gen_energy_entity):
-                self.old_state['energy']['generation'] = parse_sensor_state(self.hass.states.get(self.gen_energy_entity))
-                self.old_state['energy']['flow'] = parse_sensor_state(self.hass.states.get(self.flow_energy_entity))
-                self.stale_state['energy']['flow'] = self.old_state['energy']['flow']
-                return True
+            self.inputs.refresh(self.hass)
+            self._seed(self.inputs.values)
+            return True
         except Exception as e:
             _LOGGER.fatal("Failed: %s", str(e))
             raise ConfigEntryNotReady
         
-    async def perform_calculations(self) -> None:
-        """Perform calculations to store new states"""
-        gen_amp = parse_sensor_state(self.hass.states.get(self.gen_amp_entity))
-        con_amp = parse_sensor_state(self.hass.states.get(self.con_amp_entity))
-        if gen_amp not in [STATE_UNAVAILABLE, STATE_UNKNOWN] and con_amp not in [STATE_UNAVAILABLE, STATE_UNKNOWN]:
-            # Generation is more than consumption
-            if gen_amp > con_amp:
-                # Calculate power
-                gen_power = parse_sensor_state(self.hass.states.get(self.gen_power_entity))
-                flow_power = -1*parse_sensor_state(self.hass.states.get(self.flow_power_entity))
-                self.new_state['sensors']['consumption_power'] = gen_power + flow_power
-                self.new_state['sensors']['import_power'] = 0
-                self.new_state['sensors']['export_power'] = -1*flow_power
-                self.old_state['power']['consumption'] = self.new_state['sensors']['consumption_power']
-                self.old_state['power']['generation'] = gen_power
-                self.old_state['power']['flow'] = flow_power
-                # Calculate energy
-                gen_energy = parse_sensor_state(self.hass.states.get(self.gen_energy_entity))
-                flow_energy = parse_sensor_state(self.hass.states.get(self.flow_energy_entity))
-                if gen_energy == self.old_state['energy']['generation']:
-                    self.transient_state['energy']['flow'] = self.transient_state['energy']['flow'] - (flow_energy - self.old_state['energy']['flow'])
-                else:
-                    self.new_state['sensors']['consumption_energy'] = self.old_state['energy']['consumption'] + ((gen_energy - self.old_state['energy']['generation']) - (flow_energy - self.old_state['energy']['flow'])) + self.transient_state['energy']['flow']
-                    self.transient_state['energy']['flow'] = 0
-                    self.old_state['energy']['consumption'] = self.new_state['sensors']['consumption_energy']
-                self.new_state['sensors']['export_energy'] = self.old_state['energy']['export'] + (flow_energy - self.old_state['energy']['flow'])
-                if self.new_state['sensors']['export_energy'] < 0:
-                    _LOGGER.warning('Old export: ' + str(self.old_state['energy']['export']) + 'New flow energy: ' + str(flow_energy) + ', Old flow energy: ' + str(flow_energy))
-                self.old_state['energy']['export'] = self.new_state['sensors']['export_energy']
-                self.old_state['energy']['flow'] = flow_energy
-                self.old_state['energy']['generation'] = gen_energy
-            # Consumption is more than generation
-            else:
-                # Calculate power
-                gen_power = parse_sensor_state(self.hass.states.get(self.gen_power_entity))
-                flow_power = parse_sensor_state(self.hass.states.get(self.flow_power_entity))
-                self.new_state['sensors']['consumption_power'] = gen_power + flow_power
-                self.new_state['sensors']['import_power'] = flow_power
-                self.new_state['sensors']['export_power'] = 0
-                self.old_state['power']['consumption'] = self.new_state['sensors']['consumption_power']
-                self.old_state['power']['generation'] = gen_power
-                self.old_state['power']['flow'] = flow_power
-                # Calculate energy
-                gen_energy = parse_sensor_state(self.hass.states.get(self.gen_energy_entity))
-                flow_energy = parse_sensor_state(self.hass.states.get(self.flow_energy_entity))
-                if self.transient_state['energy']['flow'] == 0:
-                    self.new_state['sensors']['consumption_energy'] = self.old_state['energy']['consumption'] + (gen_energy - self.old_state['energy']['generation']) + (flow_energy - self.old_state['energy']['flow'])
-                else:
-                    if abs((gen_energy - self.old_state['energy']['generation']) + (flow_energy - self.old_state['energy']['flow'])) > abs(self.transient_state['energy']['flow']):
-                        self.new_state['sensors']['consumption_energy'] = self.old_state['energy']['consumption'] + (gen_energy - self.old_state['energy']['generation']) + (flow_energy - self.old_state['energy']['flow']) + self.transient_state['energy']['flow']
-                        self.transient_state['energy']['flow'] = 0
-                self.new_state['sensors']['import_energy'] = self.old_state['energy']['import'] + (flow_energy - self.old_state['energy']['flow'])
-                self.old_state['energy']['consumption'] = self.new_state['sensors']['consumption_energy']
-                self.old_state['energy']['import'] = self.new_state['sensors']['import_energy']
-                self.old_state['energy']['flow'] = flow_energy
-                self.old_state['energy']['generation'] = gen_energy
+    def try_start(self) -> bool:
+        """Seed the calculations once every input has a numeric state, return whether they have."""
+        if self.ready:
+            return True
+        try:
+            self.inputs.refresh(self.hass)
+        except ConfigEntryNotReady:
+            return False
+        self._seed(self.inputs.values)
+        self.ready = True
+        self.stats.startup_s = monotonic() - self.stats.started
+        return True
+
+    def set_result_paths(self, paths: Sequence[str]) -> None:
+        """Set the attributes the result snapshots hold, as paths like 'sensors.import_power'."""
+        self.result_paths = tuple(paths)
+        getter = attrgetter(*self.result_paths) if self.result_paths else lambda _api: ()
+        # attrgetter returns a bare value instead of a tuple for a single path
+        self._result_getter = getter if len(self.result_paths) != 1 else lambda api: (getter(api),)
+        self.result = self._build_result(self.result.generation)
+
+    def _build_result(self, generation: int) -> NetMeterResult:
+        """Return a snapshot of the rounded values of the result paths."""
+        values = tuple([round(value, 2) for value in self._result_getter(self)])
+        return NetMeterResult(generation, self.inputs.timestamp, values)
+
+    def update_result(self) -> NetMeterResult:
+        """Snapshot the result of the latest calculation."""
+        self.previous_result = self.result
+        self.result = self._build_result(self.result.generation + 1)
+        return self.result
+
+    def result_attributes(self) -> dict[str, Any]:
+        """Return the debugging attributes the sensors share for the latest result.
+
+        Nothing is worked out during the calculations. The attributes are
+        built from the current state when the first sensor writes its state
+        after a calculation, and reused by the others until the next one.
+        Empty until the first result.
+        """
+        generation = self.result.generation
+        if generation and generation != self._attributes_generation:
+            gen_amp, con_amp = self.inputs.values[:2]
+            self._attributes = {
+                ATTR_DIRECTION: 'export' if gen_amp > con_amp else 'import',
+                ATTR_AMP_MARGIN: round(gen_amp - con_amp, 2),
+                ATTR_TRANSIENT_CARRY: round(self.state.transient_flow_energy, 3),
+                ATTR_INPUTS_UPDATED: self.inputs.updated_at(),
+            }
+            self._attributes_generation = generation
+        return self._attributes
+
+    @property
+    def hour_signal(self) -> str:
+        """Return the signal the totals are sent on when calculations cross into a new hour."""
+        return f"{self.signal}_hour"
+
+    @callback
+    def _async_close_hours(self, timestamp: float) -> None:
+        """Send the totals at the end of the hours before the one of timestamp (in seconds).
+
+        Called before the calculation at timestamp, so the totals are the ones
+        the open hour ended with. Hours that passed without calculations, like
+        while Home Assistant was stopped, end with the same totals.
+        """
+        hour = timestamp // 3600 * 3600
+        if hour <= self.open_hour:
+            return
+        if self.open_hour:
+            totals = {key: getattr(self.sensors, key) for key in ENERGY_KEYS}
+            async_dispatcher_send(self.hass, self.hour_signal, self.open_hour, hour, totals)
+        self.open_hour = hour
+
+    @callback
+    def async_publish(self) -> None:
+        """Snapshot the result of the latest calculation and send it to the entities."""
+        async_dispatcher_send(self.hass, self.signal, self.update_result())
+
+    def _seed(self, values: list[float]) -> None:
+        """Seed the calculator from the raw values of the inputs."""
+        self.calculator.seed(values[3], values[5], values[7] if self.reactive else 0.0)
+
+    async def async_restore(self, store: Store) -> None:
+        """Restore the accumulated totals from store and save future changes to it."""
+        self._store = store
+        if (data := await store.async_load()) is None:
+            return
+        self.sensors.consumption_energy = data['consumption_energy']
+        self.sensors.import_energy = data['import_energy']
+        self.sensors.export_energy = data['export_energy']
+        self.sensors.reactive_import_energy = data.get('reactive_import_energy', 0.0)
+        self.sensors.reactive_export_energy = data.get('reactive_export_energy', 0.0)
+        self.state.transient_flow_energy = data['transient_flow_energy']
+        for field in fields(self.tariff_sensors):
+            setattr(self.tariff_sensors, field.name, data.get(field.name, 0.0))
+        if self.external_statistics:
+            self.open_hour = data.get('open_hour', 0.0)
+        self._saved_totals = self._totals()
+
+    async def async_save(self) -> None:
+        """Write the accumulated totals to the store right away."""
+        if self._store is not None:
+            await self._store.async_save(self._data_to_save())
+
+    def _totals(self) -> tuple[float, ...]:
+        """Return the accumulated totals that are persisted, and the open hour."""
+        return (
+            self.sensors.consumption_energy,
+            self.sensors.import_energy,
+            self.sensors.export_energy,
+            self.state.transient_flow_energy,
+            self.sensors.reactive_import_energy,
+            self.sensors.reactive_export_energy,
+            self.open_hour,
+            *_tariff_totals(self.tariff_sensors),
+        )
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Schedule a delayed save if the totals changed since the last one.
+
+        Only one save is scheduled at a time, so changes made while it is
+        pending are batched into the same write.
+        """
+        if self._store is None or self._save_scheduled or self._totals() == self._saved_totals:
+            return
+        self._save_scheduled = True
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, float]:
+        """Return the data to persist."""
+        self._save_scheduled = False
+        self._saved_totals = totals = self._totals()
+        return {
+            'consumption_energy': totals[0],
+            'import_energy': totals[1],
+            'export_energy': totals[2],
+            'transient_flow_energy': totals[3],
+            'reactive_import_energy': totals[4],
+            'reactive_export_energy': totals[5],
+            'open_hour': totals[6],
+            **asdict(self.tariff_sensors),
+        }
+
+    async def perform_calculations(self) -> bool:
+        """Perform calculations to store new states, return whether anything was calculated"""
+        stats = self.stats
+        start = perf_counter()
+        try:
+            changed = self.inputs.refresh(self.hass)
+        except ConfigEntryNotReady:
+            stats.parse_failures += 1
+            raise
+        stats.input_changes += changed
+        inputs = self.inputs
+        timeout = self.stale_input_timeout
+        if timeout and (oldest := inputs.oldest_report()) is not None and time() - oldest > timeout:
+            # A stale input is as unreliable as an unavailable one
+            if not self._stale:
+                self._stale = True
+                stats.stale_inputs += 1
+            raise ConfigEntryNotReady
+        self._stale = False
+        # Unchanged inputs give the same result, so there is nothing to do.
+        if not changed and self._calculated and self.calculator.seeded:
+            stats.skipped_calculations += 1
+            return False
+        values = inputs.values
+        gen_amp, con_amp, flow_power, raw_flow_energy, gen_power, raw_gen_energy = values[:6]
+        timestamp = inputs.timestamp
+        flow_energy = self.flow_energy_filter.filter(raw_flow_energy, timestamp)
+        gen_energy = self.gen_energy_filter.filter(raw_gen_energy, timestamp)
+        reactive_energy = self.reactive_energy_filter.filter(values[7], timestamp) if self.reactive else 0.0
+        if not self.calculator.seeded:
+            self.calculator.seed(flow_energy, gen_energy, reactive_energy)
+        self._calculated = True
+        if self.external_statistics:
+            self._async_close_hours(timestamp)
+        old_export = self.sensors.export_energy
+        old_flow_energy = self.state.flow_energy
+        old_carry = self.state.transient_flow_energy
+        self.calculator.update(gen_amp, con_amp, flow_power, flow_energy, gen_power, gen_energy, timestamp)
+        if self.reactive:
+            self.calculator.update_reactive(gen_amp > con_amp, flow_power, values[6], reactive_energy)
+        if old_carry != 0 and self.state.transient_flow_energy == 0:
+            stats.carry_events += 1
+        sensors = self.sensors
+        self.trace.record((
+            timestamp, gen_amp, con_amp, flow_power, raw_flow_energy, gen_power, raw_gen_energy,
+            sensors.consumption_power, sensors.import_power, sensors.export_power,
+            sensors.consumption_energy, sensors.import_energy, sensors.export_energy,
+        ))
+        self.rollups.update(timestamp, sensors.import_power, sensors.export_power, sensors.consumption_energy, sensors.export_energy, self.state.generation_energy)
+        if sensors.export_energy < 0 and sensors.export_energy != old_export:
+            _LOGGER.warning('Export energy went negative: old export: %s, new export: %s, old flow energy: %s, new flow energy: %s', old_export, sensors.export_energy, old_flow_energy, flow_energy)
+        self._async_schedule_save()
+        stats.record_calculation(perf_counter() - start)
+        return True
 
 
 @dataclass
@@ -177,6 +481,7 @@ class RoysNetMeterSensorEntityDescription(SensorEntityDescription):
     """Describes Roy's Net Meter sensor entities."""
 
     icon: str = "mdi:tranmission-tower"
+    source: str = "sensors"
 
 
 SENSOR_TYPES: tuple[RoysNetMeterSensorEntityDescription, ...] = (
@@ -225,4 +530,197 @@ SENSOR_TYPES: tuple[RoysNetMeterSensorEntityDescription, ...] = (
         device_class=SensorDeviceClass.ENERGY,
         state_class=SensorStateClass.TOTAL_INCREASING
     ),
-)
\ No newline at end of file
+)
+
+# Reactive power of the flow, only added when the Var and kVarh inputs are configured
+REACTIVE_SENSOR_TYPES: tuple[RoysNetMeterSensorEntityDescription, ...] = (
+    RoysNetMeterSensorEntityDescription(
+        key="reactive_import_power",
+        name="Reactive Import Power",
+        native_unit_of_measurement=UNIT_VAR,
+        icon="mdi:sine-wave",
+        device_class=SensorDeviceClass.REACTIVE_POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="reactive_export_power",
+        name="Reactive Export Power",
+        native_unit_of_measurement=UNIT_VAR,
+        icon="mdi:sine-wave",
+        device_class=SensorDeviceClass.REACTIVE_POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="reactive_import_energy",
+        name="Imported Reactive Energy",
+        native_unit_of_measurement=UNIT_KILO_VAR_HOUR,
+        icon="mdi:transmission-tower-export",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="reactive_export_energy",
+        name="Exported Reactive Energy",
+        native_unit_of_measurement=UNIT_KILO_VAR_HOUR,
+        icon="mdi:transmission-tower-import",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="power_factor",
+        name="Power Factor",
+        icon="mdi:angle-acute",
+        device_class=SensorDeviceClass.POWER_FACTOR,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+)
+
+# Instrumentation of the calculations, disabled unless enabled in the entity registry
+DIAGNOSTIC_SENSOR_TYPES: tuple[RoysNetMeterSensorEntityDescription, ...] = (
+    RoysNetMeterSensorEntityDescription(
+        key="last_latency_us",
+        name="Calculation Latency",
+        native_unit_of_measurement=UnitOfTime.MICROSECONDS,
+        icon="mdi:timer-outline",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="mean_latency_us",
+        name="Mean Calculation Latency",
+        native_unit_of_measurement=UnitOfTime.MICROSECONDS,
+        icon="mdi:timer-outline",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="calculations",
+        name="Calculations",
+        icon="mdi:counter",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="skipped_calculations",
+        name="Skipped Calculations",
+        icon="mdi:counter",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="input_changes",
+        name="Input Changes",
+        icon="mdi:counter",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="published_writes",
+        name="Published Writes",
+        icon="mdi:counter",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="suppressed_writes",
+        name="Suppressed Writes",
+        icon="mdi:counter",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="parse_failures",
+        name="Parse Failures",
+        icon="mdi:counter",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="carry_events",
+        name="Transient Carry Events",
+        icon="mdi:counter",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        source="stats",
+    ),
+    *(
+        RoysNetMeterSensorEntityDescription(
+            key=key,
+            name=name,
+            icon="mdi:counter",
+            entity_category=EntityCategory.DIAGNOSTIC,
+            entity_registry_enabled_default=False,
+            source="stats",
+        )
+        for key, name in (
+            ("counter_resets", "Counter Resets"),
+            ("counter_rollovers", "Counter Rollovers"),
+            ("impossible_deltas", "Impossible Deltas"),
+            ("negative_glitches", "Negative Glitches"),
+            ("stale_inputs", "Stale Inputs"),
+        )
+    ),
+)
+
+
+# Running aggregates of the current hour and day
+ROLLUP_SENSOR_TYPES: tuple[RoysNetMeterSensorEntityDescription, ...] = (
+    *(
+        RoysNetMeterSensorEntityDescription(
+            key=f"{period}_peak_{direction}_power",
+            name=f"{period.title()} Peak {direction.title()} Power",
+            native_unit_of_measurement=UnitOfPower.WATT,
+            icon="mdi:transmission-tower-export" if direction == "import" else "mdi:transmission-tower-import",
+            device_class=SensorDeviceClass.POWER,
+            state_class=SensorStateClass.MEASUREMENT,
+            source="rollups",
+        )
+        for period in ("hourly", "daily")
+        for direction in ("import", "export")
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="self_consumption_ratio",
+        name="Self-Consumption Ratio",
+        native_unit_of_measurement=PERCENTAGE,
+        icon="mdi:solar-power-variant",
+        state_class=SensorStateClass.MEASUREMENT,
+        source="rollups",
+    ),
+    RoysNetMeterSensorEntityDescription(
+        key="solar_coverage",
+        name="Solar Coverage",
+        native_unit_of_measurement=PERCENTAGE,
+        icon="mdi:home-lightning-bolt",
+        state_class=SensorStateClass.MEASUREMENT,
+        source="rollups",
+    ),
+)
+
+# Energy per time-of-use tariff, only added when a tariff schedule is configured
+TARIFF_SENSOR_TYPES: tuple[RoysNetMeterSensorEntityDescription, ...] = tuple(
+    RoysNetMeterSensorEntityDescription(
+        key=f"{tariff}_{kind}_energy",
+        name=f"{tariff.replace('_', ' ').title().replace(' ', '-')} {name}",
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        icon=icon,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        source="tariff_sensors",
+    )
+    for tariff in TARIFFS
+    for kind, name, icon in zip(
+        ENERGY_KINDS,
+        ("Consumed Energy", "Imported Energy", "Exported Energy"),
+        ("mdi:home-lightning-bolt-outline", "mdi:transmission-tower-export", "mdi:transmission-tower-import"),
+    )
+)
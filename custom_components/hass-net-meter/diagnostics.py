@@ -0,0 +1,27 @@
+"""Diagnostics support for Roy's Net Meter."""
+from __future__ import annotations
+
+from dataclasses import asdict
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, DATA_KEY_API, DATA_KEY_COORDINATOR, ROLLUP_SENSOR_TYPES, RoysNetMeter
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    api: RoysNetMeter = data[DATA_KEY_API]
+    return {
+        'config': {**entry.data, **entry.options},
+        'last_update_success': data[DATA_KEY_COORDINATOR].last_update_success,
+        'inputs': dict(zip(api.input_entities, api.inputs.values)),
+        'state': asdict(api.state),
+        'sensors': asdict(api.sensors),
+        'stats': api.stats.as_dict(),
+        'rollups': {description.key: getattr(api.rollups, description.key) for description in ROLLUP_SENSOR_TYPES},
+    }
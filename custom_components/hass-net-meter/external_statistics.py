@@ -0,0 +1,56 @@
+"""Hourly external statistics of the Roy's Net Meter energy totals."""
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.util import dt as dt_util
+
+from .const import ENERGY_KEYS, SENSOR_TYPES, STATISTICS_SOURCE, RoysNetMeter
+
+
+def external_statistic_id(entry_id: str, key: str) -> str:
+    """Return the statistic ID of an energy total of a config entry."""
+    return f"{STATISTICS_SOURCE}:{entry_id.lower()}_{key}"
+
+
+def external_metadata(entry_id: str, name: str) -> dict[str, StatisticMetaData]:
+    """Return the statistic metadata of the energy totals of a config entry, by sensor key."""
+    return {
+        description.key: StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{name} {description.name}",
+            source=STATISTICS_SOURCE,
+            statistic_id=external_statistic_id(entry_id, description.key),
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        )
+        for description in SENSOR_TYPES
+        if description.key in ENERGY_KEYS
+    }
+
+
+@callback
+def async_track_external_statistics(hass: HomeAssistant, api: RoysNetMeter, entry_id: str, name: str) -> CALLBACK_TYPE:
+    """Add the statistics of the energy totals for every hour that ends, return a callback to stop.
+
+    The meter sends the totals an hour ended with when its calculations
+    cross into a new hour, so no state history is needed to compile them.
+    Hours that passed while Home Assistant was stopped get the totals it
+    stopped with. Hours the meter was not running yet are left out.
+    """
+    metadata = external_metadata(entry_id, name)
+
+    @callback
+    def _async_add_hours(start: float, end: float, totals: Mapping[str, float]) -> None:
+        """Add the statistics of the hours from start to end (in seconds)."""
+        hours = [dt_util.utc_from_timestamp(hour) for hour in range(int(start), int(end), 3600)]
+        for key, meta in metadata.items():
+            total = totals[key]
+            async_add_external_statistics(hass, meta, [StatisticData(start=hour, state=total, sum=total) for hour in hours])
+
+    return async_dispatcher_connect(hass, api.hour_signal, _async_add_hours)
@@ -0,0 +1,63 @@
+"""State model for the Roy's Net Meter calculations."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class NetMeterState:
+    """Meter readings and carry-over the next calculation depends on."""
+
+    flow_energy: float = 0.0
+    generation_energy: float = 0.0
+    transient_flow_energy: float = 0.0
+    # Previous timestamped sample of the signed flow power (positive when
+    # importing), and the import and export power integrated over the samples
+    # since the flow energy last changed.
+    last_timestamp: float | None = None
+    last_power: float = 0.0
+    import_area: float = 0.0
+    export_area: float = 0.0
+    reactive_energy: float = 0.0
+
+
+@dataclass(slots=True)
+class NetMeterSensors:
+    """Values published by the sensors, named after the sensor keys."""
+
+    consumption_power: float = 0.0
+    import_power: float = 0.0
+    export_power: float = 0.0
+    consumption_energy: float = 0.0
+    import_energy: float = 0.0
+    export_energy: float = 0.0
+    # Only calculated when the reactive power and energy of the flow are measured
+    reactive_import_power: float = 0.0
+    reactive_export_power: float = 0.0
+    reactive_import_energy: float = 0.0
+    reactive_export_energy: float = 0.0
+    power_factor: float = 1.0
+
+
+@dataclass(slots=True)
+class NetMeterTariffSensors:
+    """Energy accumulated per tariff, named after the sensor keys."""
+
+    peak_consumption_energy: float = 0.0
+    peak_import_energy: float = 0.0
+    peak_export_energy: float = 0.0
+    shoulder_consumption_energy: float = 0.0
+    shoulder_import_energy: float = 0.0
+    shoulder_export_energy: float = 0.0
+    off_peak_consumption_energy: float = 0.0
+    off_peak_import_energy: float = 0.0
+    off_peak_export_energy: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class NetMeterResult:
+    """Rounded values of one calculation, in the order of RoysNetMeter.result_paths."""
+
+    generation: int = 0
+    timestamp: float = 0.0
+    values: tuple[float, ...] = ()
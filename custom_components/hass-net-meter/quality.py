@@ -0,0 +1,88 @@
+"""Input quality checks of the Roy's Net Meter calculations."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from math import ceil, log10
+
+from .stats import NetMeterStats
+
+# Highest power (in kW) a meter can plausibly have flowed through it between
+# two readings, and the reading resolution (in kWh) allowed on top of it.
+MAX_POWER_KW = 100.0
+READING_TOLERANCE = 0.01
+# A counter that drops from at least this fraction of the next power of ten
+# is taken to have rolled over at that power of ten.
+ROLLOVER_FRACTION = 0.9
+
+
+@dataclass(slots=True)
+class CounterFilter:
+    """Turn the raw readings of an energy counter into a continuous, plausible reading.
+
+    The filter keeps an offset that is added to the raw readings, so resets
+    and rollovers of the counter do not show up as huge deltas:
+
+    - a drop of at most READING_TOLERANCE is jitter, the reading is held;
+    - a drop from close to a power of ten is a rollover at that power of ten,
+      if the energy counted across the rollover is plausible;
+    - any other drop is a reset to zero, and the counter continues from where
+      it was, with the new reading counted on top;
+    - a rise faster than MAX_POWER_KW is impossible and held, unless the next
+      distinct reading keeps rising from it, then the counter continues from
+      the new level.
+
+    Each of those is counted once in stats, a held reading that is reported
+    again is not counted again.
+    """
+
+    stats: NetMeterStats
+    offset: float = 0.0
+    last_raw: float | None = None
+    last_timestamp: float = 0.0
+    pending_raw: float | None = None
+    held_raw: float | None = None
+
+    def filter(self, raw: float, timestamp: float) -> float:
+        """Return the continuous reading of a raw reading at timestamp (in seconds)."""
+        last = self.last_raw
+        if last is None:
+            self.last_raw = raw
+            self.last_timestamp = timestamp
+            return self.offset + raw
+        delta = raw - last
+        if delta == 0:
+            return self.offset + last
+        stats = self.stats
+        max_delta = MAX_POWER_KW * max(timestamp - self.last_timestamp, 0) / 3600 + READING_TOLERANCE
+        if delta < 0:
+            if -delta <= READING_TOLERANCE:
+                if raw != self.held_raw:
+                    stats.negative_glitches += 1
+                    self.held_raw = raw
+                return self.offset + last
+            wrap = 10 ** ceil(log10(last)) if last > 0 else 0
+            if raw < last * (1 - ROLLOVER_FRACTION) and last >= wrap * ROLLOVER_FRACTION and raw + wrap - last <= max_delta:
+                stats.counter_rollovers += 1
+                self.offset += wrap
+            else:
+                # The counter started over from zero
+                stats.counter_resets += 1
+                self.offset += last
+            self.pending_raw = self.held_raw = None
+            self.last_raw = raw
+            self.last_timestamp = timestamp
+            return self.offset + raw
+        if delta > max_delta:
+            pending = self.pending_raw
+            if pending is None or raw <= pending:
+                if raw != pending:
+                    stats.impossible_deltas += 1
+                    self.pending_raw = raw
+                return self.offset + last
+            # The counter kept counting from the jump, continue from there
+            stats.counter_resets += 1
+            self.offset += last - pending
+        self.pending_raw = self.held_raw = None
+        self.last_raw = raw
+        self.last_timestamp = timestamp
+        return self.offset + raw
@@ -0,0 +1,177 @@
+"""Replay a recorded trace of the input entities through the net metering calculations.
+
+Reads a CSV or JSONL trace and writes the consumption, import and export
+series as CSV. Every stage is a generator, so a trace of any length is
+replayed in constant memory. Nothing in here needs Home Assistant; run it
+with ``python custom_components/hass-net-meter/replay.py trace.csv``.
+
+Two layouts are understood:
+
+- wide: one record per sample, with a ``timestamp`` and one field per input
+  named like the NetMeterSample fields (gen_amp, con_amp, flow_power,
+  flow_energy, gen_power, gen_energy);
+- long: one record per state change, with ``entity_id``, ``state`` and
+  ``last_changed``, like the history export of Home Assistant. The entity of
+  every input is given with ``--entity gen_amp=sensor.inverter_current`` and
+  so on, and the records must be in time order.
+
+Records with a value that is not a number, like ``unavailable``, are skipped.
+"""
+from __future__ import annotations
+
+if __name__ == '__main__' and not __package__:
+    # Run as a script, import the sibling modules through a bare package
+    # that does not run the Home Assistant facing __init__.py.
+    from standalone import register
+
+    __package__ = register()
+
+import argparse
+from collections.abc import Iterable, Iterator, Mapping
+import csv
+from datetime import datetime
+import json
+import sys
+from typing import Any, TextIO
+
+from .calculator import NetMeterCalculator, NetMeterOutput, NetMeterSample
+from .quality import CounterFilter
+from .stats import NetMeterStats
+
+INPUTS = NetMeterSample._fields[:6]
+
+
+def read_records(file: TextIO, file_format: str) -> Iterator[Mapping[str, Any]]:
+    """Yield the records of a CSV or JSONL file one at a time."""
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def parse_timestamp(value: Any) -> float:
+    """Return a timestamp in seconds from epoch seconds or an ISO 8601 string."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+
+
+def wide_samples(records: Iterable[Mapping[str, Any]], stats: NetMeterStats) -> Iterator[NetMeterSample]:
+    """Yield a sample per record that holds all inputs."""
+    for record in records:
+        try:
+            yield NetMeterSample(*(float(record[name]) for name in INPUTS), parse_timestamp(record['timestamp']))
+        except (KeyError, TypeError, ValueError):
+            stats.parse_failures += 1
+
+
+def long_samples(records: Iterable[Mapping[str, Any]], entities: Mapping[str, str], stats: NetMeterStats) -> Iterator[NetMeterSample]:
+    """Yield a sample per state change once every input had a value.
+
+    Only the latest value of every input is kept, each input holds its value
+    until it changes.
+    """
+    index = {entity_id: INPUTS.index(name) for name, entity_id in entities.items()}
+    values: list[float | None] = [None] * len(INPUTS)
+    for record in records:
+        if (position := index.get(record.get('entity_id'))) is None:
+            continue
+        try:
+            values[position] = float(record['state'])
+            timestamp = parse_timestamp(record['last_changed'])
+        except (KeyError, TypeError, ValueError):
+            stats.parse_failures += 1
+            continue
+        if None not in values:
+            yield NetMeterSample(*values, timestamp)
+
+
+def filter_counters(samples: Iterable[NetMeterSample], stats: NetMeterStats) -> Iterator[NetMeterSample]:
+    """Pass the energy readings through the same counter filters as the live meter."""
+    flow_energy_filter = CounterFilter(stats)
+    gen_energy_filter = CounterFilter(stats)
+    for sample in samples:
+        yield sample._replace(
+            flow_energy=flow_energy_filter.filter(sample.flow_energy, sample.timestamp),
+            gen_energy=gen_energy_filter.filter(sample.gen_energy, sample.timestamp),
+        )
+
+
+def calculate(samples: Iterable[NetMeterSample], stats: NetMeterStats) -> Iterator[tuple[float, NetMeterOutput]]:
+    """Yield the timestamp and sensor values after every sample."""
+    calculator = NetMeterCalculator()
+    for sample in samples:
+        if not calculator.seeded:
+            calculator.seed(sample.flow_energy, sample.gen_energy)
+        calculator.update(*sample)
+        stats.calculations += 1
+        yield sample.timestamp, calculator.output()
+
+
+def thin(series: Iterable[tuple[float, NetMeterOutput]], interval: float) -> Iterator[tuple[float, NetMeterOutput]]:
+    """Yield at most one row per interval seconds, and always the last one."""
+    last = None
+    next_timestamp = float('-inf')
+    for timestamp, output in series:
+        last = (timestamp, output)
+        if timestamp >= next_timestamp:
+            next_timestamp = timestamp + interval
+            last = None
+            yield timestamp, output
+    if last is not None:
+        yield last
+
+
+def parse_entities(values: list[str]) -> dict[str, str]:
+    """Parse the input=entity_id arguments."""
+    entities = dict(value.split('=', 1) for value in values)
+    if unknown := set(entities) - set(INPUTS):
+        raise argparse.ArgumentTypeError(f"unknown inputs: {', '.join(sorted(unknown))}")
+    if missing := set(INPUTS) - set(entities):
+        raise argparse.ArgumentTypeError(f"missing inputs: {', '.join(sorted(missing))}")
+    return entities
+
+
+def main() -> None:
+    """Parse the arguments, replay the trace and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace', type=argparse.FileType('r'), help='CSV or JSONL trace, - for stdin')
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='format of the trace, guessed from its name by default')
+    parser.add_argument('--entity', action='append', default=[], metavar='INPUT=ENTITY_ID', help='entity of an input in a long trace, once per input')
+    parser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout, help='CSV file of the sensor series, stdout by default')
+    parser.add_argument('--interval', type=float, default=0.0, help='write at most one row per this many seconds')
+    args = parser.parse_args()
+    file_format = args.format or ('jsonl' if args.trace.name.endswith(('.jsonl', '.json')) else 'csv')
+
+    stats = NetMeterStats()
+    records = read_records(args.trace, file_format)
+    if args.entity:
+        try:
+            samples = long_samples(records, parse_entities(args.entity), stats)
+        except argparse.ArgumentTypeError as err:
+            parser.error(str(err))
+    else:
+        samples = wide_samples(records, stats)
+    series = thin(calculate(filter_counters(samples, stats), stats), args.interval)
+
+    writer = csv.writer(args.output)
+    writer.writerow(('timestamp', *NetMeterOutput._fields))
+    output = None
+    for timestamp, output in series:
+        writer.writerow((timestamp, *output))
+    args.output.flush()
+
+    print(f'{stats.calculations} samples, {stats.parse_failures} skipped records', file=sys.stderr)
+    for name in ('counter_resets', 'counter_rollovers', 'impossible_deltas', 'negative_glitches'):
+        if value := getattr(stats, name):
+            print(f'{name.replace("_", " ")}: {value}', file=sys.stderr)
+    if output is not None:
+        for name in ('consumption_energy', 'import_energy', 'export_energy'):
+            print(f'{name.replace("_", " ")}: {getattr(output, name):.3f} kWh', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
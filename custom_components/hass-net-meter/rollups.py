@@ -0,0 +1,72 @@
+"""Running hourly and daily aggregates of the Roy's Net Meter calculations."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, timezone, tzinfo
+
+
+@dataclass(slots=True)
+class NetMeterRollups:
+    """Peak powers of the current hour and day, and how much of today's solar was used.
+
+    Each sample costs a few comparisons and additions. The period
+    boundaries are only worked out again when a sample falls past them.
+    The self-consumption ratio is the share of today's generation that was
+    not exported, the solar coverage the share of today's consumption that
+    it covered, both in percent.
+    """
+
+    time_zone: tzinfo = timezone.utc
+    hourly_peak_import_power: float = 0.0
+    hourly_peak_export_power: float = 0.0
+    daily_peak_import_power: float = 0.0
+    daily_peak_export_power: float = 0.0
+    self_consumption_ratio: float = 0.0
+    solar_coverage: float = 0.0
+    day_generation_energy: float = 0.0
+    day_export_energy: float = 0.0
+    day_consumption_energy: float = 0.0
+    hour_end: float = 0.0
+    day_end: float = 0.0
+    _last_energy: tuple[float, float, float] | None = field(default=None, repr=False)
+
+    def update(self, timestamp: float, import_power: float, export_power: float, consumption_energy: float, export_energy: float, generation_energy: float) -> None:
+        """Add the sensor values of a sample calculated at timestamp (in seconds)."""
+        if timestamp >= self.hour_end:
+            self._roll(timestamp)
+        if import_power > self.hourly_peak_import_power:
+            self.hourly_peak_import_power = import_power
+            if import_power > self.daily_peak_import_power:
+                self.daily_peak_import_power = import_power
+        if export_power > self.hourly_peak_export_power:
+            self.hourly_peak_export_power = export_power
+            if export_power > self.daily_peak_export_power:
+                self.daily_peak_export_power = export_power
+        last = self._last_energy
+        self._last_energy = (consumption_energy, export_energy, generation_energy)
+        if last is None:
+            return
+        self.day_consumption_energy += consumption_energy - last[0]
+        self.day_export_energy += export_energy - last[1]
+        self.day_generation_energy += generation_energy - last[2]
+        self_consumed = max(self.day_generation_energy - self.day_export_energy, 0.0)
+        if self.day_generation_energy > 0:
+            self.self_consumption_ratio = min(self_consumed / self.day_generation_energy * 100, 100.0)
+        if self.day_consumption_energy > 0:
+            self.solar_coverage = min(self_consumed / self.day_consumption_energy * 100, 100.0)
+
+    def rebaseline(self) -> None:
+        """Take the energy of the next sample as the baseline of the day's deltas, after the meters changed."""
+        self._last_energy = None
+
+    def _roll(self, timestamp: float) -> None:
+        """Start the hour, and if needed the day, that timestamp falls in."""
+        local = datetime.fromtimestamp(timestamp, self.time_zone)
+        self.hour_end = local.replace(minute=0, second=0, microsecond=0).timestamp() + 3600
+        self.hourly_peak_import_power = self.hourly_peak_export_power = 0.0
+        if timestamp < self.day_end:
+            return
+        self.day_end = datetime.combine(local.date() + timedelta(days=1), time(), self.time_zone).timestamp()
+        self.daily_peak_import_power = self.daily_peak_export_power = 0.0
+        self.day_generation_energy = self.day_export_energy = self.day_consumption_energy = 0.0
+        self.self_consumption_ratio = self.solar_coverage = 0.0
@@ -0,0 +1,171 @@
+"""Shared scheduling of the Roy's Net Meter calculations."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+from time import monotonic
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .const import (
+    ADAPTIVE_CROSSOVER_MARGIN,
+    ADAPTIVE_POWER_CHANGE,
+    UPDATE_MODE_PUSH,
+    RoysNetMeter,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Timers may fire slightly early, meters due within this many seconds run too.
+SCHEDULE_TOLERANCE = 0.01
+
+
+@dataclass(slots=True)
+class ScheduledMeter:
+    """A meter registered with the scheduler."""
+
+    api: RoysNetMeter
+    coordinator: DataUpdateCoordinator
+    update_mode: str
+    coalesce_interval: float
+    min_interval: float
+    max_interval: float
+    interval: float = 0.0
+    due: float = 0.0
+    ready: float | None = None
+    last_flow_power: float = 0.0
+
+    def adapt(self, calculated: bool) -> None:
+        """Adjust the interval to how volatile the inputs are.
+
+        The interval drops to the minimum while the gen/con amp margin is close
+        to the crossover or the flow power changes quickly, and doubles up to
+        the maximum for every calculation the inputs stay steady.
+        """
+        gen_amp, con_amp, flow_power = self.api.inputs.values[:3]
+        change = abs(flow_power - self.last_flow_power)
+        self.last_flow_power = flow_power
+        if calculated and (abs(gen_amp - con_amp) < ADAPTIVE_CROSSOVER_MARGIN or change > ADAPTIVE_POWER_CHANGE):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(max(self.interval * 2, self.min_interval), self.max_interval)
+
+
+class NetMeterScheduler:
+    """Run the calculations of all meters from one state listener and one timer.
+
+    Push mode meters become ready when one of their inputs changes, once the
+    coalesce interval has passed but not before their adaptive interval since
+    the previous calculation is over. Poll mode meters become ready every
+    adaptive interval. A single timer runs all ready meters together, and
+    their results are published after the last calculation so their entities
+    write their states in one go. Coordinators are only updated when a meter
+    becomes available again, so all its entities write their states.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize."""
+        self.hass = hass
+        self._meters: dict[str, ScheduledMeter] = {}
+        self._entity_meters: dict[str, list[ScheduledMeter]] = {}
+        self._unsub_state: CALLBACK_TYPE | None = None
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._timer_at: float | None = None
+
+    @callback
+    def async_add(self, entry_id: str, meter: ScheduledMeter) -> None:
+        """Start scheduling the calculations of a meter, replacing any previous one of the entry.
+
+        The meter is calculated right away, and from then on whenever its
+        update mode makes it ready.
+        """
+        meter.interval = meter.min_interval
+        meter.ready = monotonic()
+        self._meters[entry_id] = meter
+        self._async_update_listeners()
+
+    @callback
+    def async_remove(self, entry_id: str) -> None:
+        """Stop scheduling the calculations of a meter."""
+        self._meters.pop(entry_id, None)
+        self._async_update_listeners()
+
+    @callback
+    def _async_update_listeners(self) -> None:
+        """Subscribe to the inputs of all push meters and reschedule the timer."""
+        if self._unsub_state is not None:
+            self._unsub_state()
+            self._unsub_state = None
+        self._entity_meters = {}
+        for meter in self._meters.values():
+            if meter.update_mode == UPDATE_MODE_PUSH:
+                for entity_id in meter.api.input_entities:
+                    self._entity_meters.setdefault(entity_id, []).append(meter)
+        if self._entity_meters:
+            self._unsub_state = async_track_state_change_event(
+                self.hass, list(self._entity_meters), self._async_state_changed
+            )
+        self._async_schedule()
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Make the meters depending on the changed entity ready."""
+        now = monotonic()
+        for meter in self._entity_meters.get(event.data['entity_id'], ()):
+            if meter.ready is None:
+                meter.ready = max(now + meter.coalesce_interval, meter.due)
+                if self._timer_at is None or meter.ready < self._timer_at:
+                    self._async_schedule()
+
+    @callback
+    def _async_schedule(self) -> None:
+        """Set the timer to the earliest ready meter."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+            self._timer_at = None
+        ready = [meter.ready for meter in self._meters.values() if meter.ready is not None]
+        if not ready:
+            return
+        self._timer_at = min(ready)
+        self._unsub_timer = async_call_later(
+            self.hass, max(0.0, self._timer_at - monotonic()), self._async_run
+        )
+
+    async def _async_run(self, _now: datetime) -> None:
+        """Calculate the ready meters and update their coordinators together."""
+        self._unsub_timer = None
+        self._timer_at = None
+        now = monotonic()
+        published = []
+        recovered = []
+        for entry_id, meter in list(self._meters.items()):
+            if meter.ready is None or meter.ready > now + SCHEDULE_TOLERANCE:
+                continue
+            calculated = False
+            try:
+                calculated = await meter.api.perform_calculations()
+            except ConfigEntryNotReady as err:
+                _LOGGER.debug('Inputs of %s are not ready', entry_id)
+                meter.coordinator.async_set_update_error(err)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.exception('Unexpected error calculating %s', entry_id)
+                meter.coordinator.async_set_update_error(err)
+            else:
+                if not meter.coordinator.last_update_success:
+                    recovered.append(meter)
+                elif calculated:
+                    published.append(meter.api)
+            meter.adapt(calculated)
+            meter.due = now + meter.interval
+            meter.ready = meter.due if meter.update_mode != UPDATE_MODE_PUSH else None
+        for api in published:
+            api.async_publish()
+        for meter in recovered:
+            meter.api.update_result()
+            meter.coordinator.async_set_updated_data(None)
+        self._async_schedule()
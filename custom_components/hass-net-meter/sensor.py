@@ -1,26 +1,39 @@
 """Support for Roy's Net Meter Sensors."""
 from __future__ import annotations
 
+from dataclasses import replace
+from datetime import datetime
+from time import monotonic
 from typing import Any
 
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_NAME
 
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.core import HomeAssistant
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 
 from .const import (
     DOMAIN,
+    ATTR_LAST_DELTA,
+    DEBUG_ATTRIBUTES,
     DATA_KEY_API,
     DATA_KEY_COORDINATOR,
     SENSOR_TYPES,
+    DIAGNOSTIC_SENSOR_TYPES,
+    ENERGY_KEYS,
+    ROLLUP_SENSOR_TYPES,
+    REACTIVE_SENSOR_TYPES,
+    TARIFF_SENSOR_TYPES,
     RoysNetMeter,
     RoysNetMeterSensorEntityDescription
     )
+from .model import NetMeterResult
 from . import RoysNetMeterEntity
 
 async def async_setup_entry(
@@ -29,23 +42,78 @@ async def async_setup_entry(
     """Set up Roy's Net Meter Sensors."""
     name = entry.data[CONF_NAME]
     data = hass.data[DOMAIN][entry.entry_id]
+    descriptions = SENSOR_TYPES + ROLLUP_SENSOR_TYPES + DIAGNOSTIC_SENSOR_TYPES
+    if data[DATA_KEY_API].reactive:
+        descriptions += REACTIVE_SENSOR_TYPES
+    if data[DATA_KEY_API].calculator.tariffs is not None:
+        descriptions += TARIFF_SENSOR_TYPES
+    api: RoysNetMeter = data[DATA_KEY_API]
+    if api.external_statistics:
+        # The hourly statistics of the energy totals are added directly,
+        # the recorder must not compile its own from the states.
+        descriptions = tuple(
+            replace(description, state_class=None) if description.key in ENERGY_KEYS else description
+            for description in descriptions
+        )
+    api.set_result_paths([f"{description.source}.{description.key}" for description in descriptions])
+    listener = RoysNetMeterResultListener(api)
+    entry.async_on_unload(async_dispatcher_connect(hass, api.signal, listener))
     sensors = [
         RoysNetMeterSensor(
-            data[DATA_KEY_API],
+            api,
             data[DATA_KEY_COORDINATOR],
             name,
             entry.entry_id,
             description,
+            listener,
         )
-        for description in SENSOR_TYPES
+        for description in descriptions
     ]
     async_add_entities(sensors, True)
 
 
+class RoysNetMeterResultListener:
+    """Hand the result snapshots of a meter to the entities whose value changed.
+
+    One listener receives the snapshot of every published calculation, and
+    compares it with the snapshot before it. Entities whose value stayed the
+    same are not called at all. Snapshots taken without being sent, when the
+    coordinator updates, are handed to every entity by the coordinator.
+    """
+
+    def __init__(self, api: RoysNetMeter) -> None:
+        """Initialize."""
+        self._api = api
+        self._entities: dict[int, RoysNetMeterSensor] = {}
+
+    @callback
+    def add(self, entity: RoysNetMeterSensor) -> None:
+        """Start handing the changes of its value to an entity."""
+        self._entities[entity.result_index] = entity
+
+    @callback
+    def remove(self, entity: RoysNetMeterSensor) -> None:
+        """Stop handing changes to an entity."""
+        self._entities.pop(entity.result_index, None)
+
+    @callback
+    def __call__(self, result: NetMeterResult) -> None:
+        """Call the entities whose value changed since the previous snapshot."""
+        values = result.values
+        previous = self._api.previous_result.values
+        if len(previous) != len(values):
+            previous = (None,) * len(values)
+        for index, entity in self._entities.items():
+            if values[index] != previous[index]:
+                entity.async_handle_result()
+
+
 class RoysNetMeterSensor(RoysNetMeterEntity, SensorEntity):
     """Representation of a Roy's Net Meter sensor."""
 
     entity_description: RoysNetMeterSensorEntityDescription
+    # The debugging attributes change with every write, keep them out of the database
+    _unrecorded_attributes = DEBUG_ATTRIBUTES
 
     def __init__(
         self,
@@ -54,16 +122,107 @@ class RoysNetMeterSensor(RoysNetMeterEntity, SensorEntity):
         _name: str,
         _device_unique_id: str,
         description: RoysNetMeterSensorEntityDescription,
+        listener: RoysNetMeterResultListener,
     ) -> None:
         """Initialize Roy's Net Meter sensors."""
         super().__init__(api, coordinator, _name, _device_unique_id)
         self.entity_description = description
+        self._listener = listener
+        self.result_index = api.result_paths.index(f"{description.source}.{description.key}")
 
         self._attr_name = f"{_name} {description.name}"
         self._attr_unique_id = f"{self._device_unique_id}/{description.name}"
+        self._published_value: float | None = None
+        self._published_available: bool | None = None
+        self._published_at: float = 0.0
+        self._unsub_pending_write: CALLBACK_TYPE | None = None
+        self._attributes: dict[str, Any] | None = None
+        self._attributes_generation = 0
+
+    async def async_added_to_hass(self) -> None:
+        """Start receiving the result snapshots."""
+        await super().async_added_to_hass()
+        self._listener.add(self)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel a pending write when the entity is removed."""
+        await super().async_will_remove_from_hass()
+        self._listener.remove(self)
+        self._cancel_pending_write()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state when the coordinator becomes available or unavailable."""
+        self.async_handle_result()
+
+    @callback
+    def async_handle_result(self) -> None:
+        """Write the state only when the published value would change.
+
+        Power sensors ignore changes within the configured deadband, and no
+        sensor publishes more often than the minimum publish interval. A change
+        that arrives too early is written once the interval has passed.
+        """
+        available = self.available
+        if available == self._published_available:
+            if self._published_value is not None:
+                deadband = self.api.power_deadband if self.entity_description.device_class == SensorDeviceClass.POWER else 0
+                if abs(self.native_value - self._published_value) <= deadband:
+                    self.api.stats.suppressed_writes += 1
+                    return
+            delay = self._published_at + self.api.min_publish_interval - monotonic()
+            if delay > 0:
+                if self._unsub_pending_write is None:
+                    self._unsub_pending_write = async_call_later(self.hass, delay, self._async_write_pending)
+                self.api.stats.suppressed_writes += 1
+                return
+        self.async_write_ha_state()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state and remember what was published."""
+        self._cancel_pending_write()
+        self._published_value = self.native_value
+        self._published_available = self.available
+        self._published_at = monotonic()
+        self.api.stats.published_writes += 1
+        super().async_write_ha_state()
+
+    @callback
+    def _async_write_pending(self, _now: datetime) -> None:
+        """Write a change that was held back by the minimum publish interval."""
+        self._unsub_pending_write = None
+        self.async_write_ha_state()
+
+    @callback
+    def _cancel_pending_write(self) -> None:
+        """Cancel a held back write."""
+        if self._unsub_pending_write is not None:
+            self._unsub_pending_write()
+            self._unsub_pending_write = None
 
     @property
     def native_value(self) -> Any:
         """Return the state of the device."""
-        return round(self.api.new_state['sensors'][self.entity_description.key], 2)
-        
+        return self.api.result.values[self.result_index]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the debugging attributes of the latest result.
+
+        They are only built when read, which Home Assistant does when the
+        state is written, and at most once per result. Diagnostic sensors
+        have none.
+        """
+        if self.entity_description.entity_category is not None:
+            return None
+        result = self.api.result
+        if result.generation != self._attributes_generation:
+            attributes = self.api.result_attributes()
+            previous = self.api.previous_result.values
+            if attributes and len(previous) == len(result.values):
+                index = self.result_index
+                attributes = {ATTR_LAST_DELTA: round(result.values[index] - previous[index], 2), **attributes}
+            self._attributes = attributes or None
+            self._attributes_generation = result.generation
+        return self._attributes
@@ -0,0 +1,40 @@
+"""Import the modules of the integration from outside Home Assistant.
+
+The integration directory is not an importable package name. register()
+adds a bare ``roys_net_meter`` package that only points at the directory,
+so the modules that do not need Home Assistant can be imported without
+running ``__init__.py``. The replay command, the tests and the benchmarks
+all go through it. import_integration() imports the real package instead,
+which needs Home Assistant.
+"""
+from __future__ import annotations
+
+import importlib.util
+from pathlib import Path
+import sys
+from types import ModuleType
+
+PACKAGE = 'roys_net_meter'
+INTEGRATION_PATH = Path(__file__).resolve().parent
+
+
+def register() -> str:
+    """Add the bare package if no package of the integration was imported yet, return its name."""
+    if PACKAGE not in sys.modules:
+        package = ModuleType(PACKAGE)
+        package.__path__ = [str(INTEGRATION_PATH)]
+        sys.modules[PACKAGE] = package
+    return PACKAGE
+
+
+def import_integration() -> ModuleType:
+    """Import and return the integration package itself, replacing the bare package."""
+    package = sys.modules.get(PACKAGE)
+    if package is None or getattr(package, '__file__', None) is None:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE, INTEGRATION_PATH / '__init__.py', submodule_search_locations=[str(INTEGRATION_PATH)]
+        )
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE] = package
+        spec.loader.exec_module(package)
+    return package
@@ -0,0 +1,83 @@
+"""Runtime statistics of the Roy's Net Meter calculations."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any
+
+# Upper bounds of the calculation latency histogram buckets, in microseconds.
+LATENCY_BUCKETS: tuple[int, ...] = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass(slots=True)
+class NetMeterStats:
+    """Counters and latency histogram of one meter, updated in O(1)."""
+
+    calculations: int = 0
+    skipped_calculations: int = 0
+    input_changes: int = 0
+    parse_failures: int = 0
+    carry_events: int = 0
+    counter_resets: int = 0
+    counter_rollovers: int = 0
+    impossible_deltas: int = 0
+    negative_glitches: int = 0
+    stale_inputs: int = 0
+    published_writes: int = 0
+    suppressed_writes: int = 0
+    last_latency_us: float = 0.0
+    max_latency_us: float = 0.0
+    total_latency_us: float = 0.0
+    latency_histogram: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    started: float = field(default_factory=monotonic)
+    # Seconds from setup until every input had a numeric state
+    startup_s: float | None = None
+
+    @property
+    def mean_latency_us(self) -> float:
+        """Return the mean latency of the performed calculations."""
+        return self.total_latency_us / self.calculations if self.calculations else 0.0
+
+    def record_calculation(self, seconds: float) -> None:
+        """Count a performed calculation that took seconds."""
+        latency = seconds * 1e6
+        self.calculations += 1
+        self.last_latency_us = latency
+        self.total_latency_us += latency
+        if latency > self.max_latency_us:
+            self.max_latency_us = latency
+        self.latency_histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics with hourly rates, for diagnostics."""
+        uptime = monotonic() - self.started
+        hours = uptime / 3600 or 1
+        histogram = {f"<={bound}": count for bound, count in zip(LATENCY_BUCKETS, self.latency_histogram)}
+        histogram[f">{LATENCY_BUCKETS[-1]}"] = self.latency_histogram[-1]
+        return {
+            'uptime_s': uptime,
+            'startup_s': self.startup_s,
+            'calculations': self.calculations,
+            'skipped_calculations': self.skipped_calculations,
+            'input_changes': self.input_changes,
+            'parse_failures': self.parse_failures,
+            'carry_events': self.carry_events,
+            'counter_resets': self.counter_resets,
+            'counter_rollovers': self.counter_rollovers,
+            'impossible_deltas': self.impossible_deltas,
+            'negative_glitches': self.negative_glitches,
+            'stale_inputs': self.stale_inputs,
+            'published_writes': self.published_writes,
+            'suppressed_writes': self.suppressed_writes,
+            'calculations_per_hour': self.calculations / hours,
+            'input_changes_per_hour': self.input_changes / hours,
+            'published_writes_per_hour': self.published_writes / hours,
+            'suppressed_writes_per_hour': self.suppressed_writes / hours,
+            'latency_us': {
+                'last': self.last_latency_us,
+                'mean': self.mean_latency_us,
+                'max': self.max_latency_us,
+                'histogram': histogram,
+            },
+        }
@@ -0,0 +1,55 @@
+"""Time-of-use tariff schedule for the Roy's Net Meter calculations."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date, datetime, tzinfo
+
+TARIFF_PEAK = 'peak'
+TARIFF_SHOULDER = 'shoulder'
+TARIFF_OFF_PEAK = 'off_peak'
+TARIFFS = (TARIFF_PEAK, TARIFF_SHOULDER, TARIFF_OFF_PEAK)
+ENERGY_KINDS = ('consumption', 'import', 'export')
+# Names of the NetMeterTariffSensors fields of every tariff, in ENERGY_KINDS order
+TARIFF_FIELDS = tuple(tuple(f"{tariff}_{kind}_energy" for kind in ENERGY_KINDS) for tariff in TARIFFS)
+
+
+def parse_holidays(holidays: str) -> frozenset[date]:
+    """Parse a comma separated list of ISO dates, raises ValueError if one is invalid."""
+    return frozenset(date.fromisoformat(day.strip()) for day in holidays.split(',') if day.strip())
+
+
+class TariffSchedule:
+    """Look up the tariff in force at a timestamp.
+
+    Weekdays use the peak and shoulder hours, every other hour is off-peak.
+    Weekends and holidays are off-peak all day. The tariff of the current
+    hour is kept, so a lookup only does the calendar work once an hour.
+    """
+
+    __slots__ = ('time_zone', 'holidays', '_hours', '_start', '_end', '_tariff')
+
+    def __init__(self, peak_hours: Iterable[int], shoulder_hours: Iterable[int], holidays: Iterable[date], time_zone: tzinfo) -> None:
+        """Initialize."""
+        hours = [TARIFFS.index(TARIFF_OFF_PEAK)] * 24
+        for hour in shoulder_hours:
+            hours[int(hour)] = TARIFFS.index(TARIFF_SHOULDER)
+        for hour in peak_hours:
+            hours[int(hour)] = TARIFFS.index(TARIFF_PEAK)
+        self._hours = tuple(hours)
+        self.holidays = frozenset(holidays)
+        self.time_zone = time_zone
+        self._start = self._end = 0.0
+        self._tariff = 0
+
+    def tariff_at(self, timestamp: float) -> int:
+        """Return the index in TARIFFS of the tariff in force at timestamp (in seconds)."""
+        if self._start <= timestamp < self._end:
+            return self._tariff
+        local = datetime.fromtimestamp(timestamp, self.time_zone)
+        self._start = local.replace(minute=0, second=0, microsecond=0).timestamp()
+        self._end = self._start + 3600
+        if local.weekday() >= 5 or local.date() in self.holidays:
+            self._tariff = TARIFFS.index(TARIFF_OFF_PEAK)
+        else:
+            self._tariff = self._hours[local.hour]
+        return self._tariff
@@ -0,0 +1,67 @@
+"""High resolution trace of the Roy's Net Meter inputs and outputs."""
+from __future__ import annotations
+
+from collections.abc import Sequence
+import csv
+from typing import TextIO
+
+import numpy as np
+
+from .calculator import NetMeterOutput, NetMeterSample
+
+# One row per calculation, the energy inputs are the raw meter readings
+TRACE_COLUMNS = ('timestamp', *NetMeterSample._fields[:6], *NetMeterOutput._fields)
+
+
+class NetMeterTrace:
+    """Ring buffer of the latest calculations.
+
+    All rows are allocated up front in one array. Recording a calculation
+    overwrites the oldest row in place, so the trace can stay on without
+    its memory growing or allocating per sample.
+    """
+
+    __slots__ = ('_rows', '_times', '_latest', '_next', '_count')
+
+    def __init__(self, size: int) -> None:
+        """Initialize."""
+        self._rows = np.zeros((size, len(TRACE_COLUMNS)))
+        # Running maximum of the timestamps, the timestamps of new inputs can
+        # be older than the rows recorded before they were swapped in
+        self._times = np.zeros(size)
+        self._latest = float('-inf')
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return how many rows are recorded."""
+        return self._count
+
+    def record(self, row: Sequence[float]) -> None:
+        """Record the values of TRACE_COLUMNS after a calculation."""
+        index = self._next
+        self._rows[index] = row
+        if row[0] > self._latest:
+            self._latest = row[0]
+        self._times[index] = self._latest
+        index += 1
+        self._next = 0 if index == len(self._rows) else index
+        if self._count < index:
+            self._count = index
+
+    def since(self, start: float) -> np.ndarray:
+        """Return a copy of the rows recorded since timestamp start (in seconds), oldest first."""
+        rows = self._rows
+        times = self._times
+        if self._count < len(rows):
+            return rows[np.searchsorted(times[:self._count], start):self._count].copy()
+        ordered = np.concatenate((rows[self._next:], rows[:self._next]))
+        return ordered[np.searchsorted(np.concatenate((times[self._next:], times[:self._next])), start):]
+
+
+def write_trace(file: TextIO, traces: dict[str, np.ndarray]) -> None:
+    """Write the rows of the traces of several meters as CSV, keyed by config entry ID."""
+    writer = csv.writer(file)
+    writer.writerow(('config_entry_id', *TRACE_COLUMNS))
+    for entry_id, rows in traces.items():
+        writer.writerows((entry_id, *row) for row in rows.tolist())
@@ -0,0 +1,27 @@
+"""Shared setup of the tests and benchmarks.
+
+The modules of the integration are imported as ``roys_net_meter.<module>``
+through the bare package of ``standalone.py``, like the replay command does.
+"""
+from __future__ import annotations
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from profiles import solar_day
+
+_spec = importlib.util.spec_from_file_location(
+    'roys_net_meter_standalone',
+    Path(__file__).resolve().parent.parent / 'custom_components' / 'hass-net-meter' / 'standalone.py',
+)
+standalone = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(standalone)
+standalone.register()
+
+
+@pytest.fixture(name='day')
+def day_fixture() -> list[tuple[float, ...]]:
+    """Return the timestamped samples of a solar day."""
+    return solar_day(2000, interval=43.2)
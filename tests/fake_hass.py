@@ -0,0 +1,65 @@
+"""Lightweight local stand-in for the parts of Home Assistant the hot path uses."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+
+class FakeState:
+    """A state object with the attributes the integration reads."""
+
+    __slots__ = ('entity_id', 'state', 'last_updated')
+
+    def __init__(self, entity_id: str, state: str, last_updated: datetime) -> None:
+        """Initialize."""
+        self.entity_id = entity_id
+        self.state = state
+        self.last_updated = last_updated
+
+
+class FakeStates:
+    """State machine keeping one FakeState per entity."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._states: dict[str, FakeState] = {}
+
+    def get(self, entity_id: str) -> FakeState | None:
+        """Return the state of an entity."""
+        return self._states.get(entity_id)
+
+    def async_set(self, entity_id: str, value: float, now: datetime) -> None:
+        """Set the state of an entity if its value changed, like Home Assistant does."""
+        state = str(value)
+        current = self._states.get(entity_id)
+        if current is None or current.state != state:
+            self._states[entity_id] = FakeState(entity_id, state, now)
+
+
+class FakeBus:
+    """Event bus that only counts the state writes of the integration's entities."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.state_writes = 0
+
+
+class FakeHass:
+    """Home Assistant stand-in with a state machine and an event bus."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.states = FakeStates()
+        self.bus = FakeBus()
+        self.data: dict[str, Any] = {}
+        self.loop = None
+
+
+class FakeCoordinator:
+    """Coordinator stand-in for CoordinatorEntity."""
+
+    last_update_success = True
+
+    def async_add_listener(self, update_callback, context=None):
+        """Accept a listener, the benchmark calls the entities directly."""
+        return lambda: None
@@ -0,0 +1,32 @@
+"""Synthetic input profiles for the tests and benchmarks."""
+from __future__ import annotations
+
+import math
+
+# Line voltage used to turn power into the amperage inputs.
+VOLTAGE = 230
+
+
+def solar_day(count: int, interval: float = 0.5, phase: float = 0.0, start: float = 0.0) -> list[tuple[float, ...]]:
+    """Return count samples of one solar day, interval seconds apart from timestamp start.
+
+    The samples are (gen_amp, con_amp, flow_power, flow_energy, gen_power,
+    gen_energy, timestamp), like NetMeterSample. Generation follows a half
+    sine over the day and consumption wobbles around 1.5 kW, so the direction
+    crosses over twice. The energy readings are rounded to Wh like the meters
+    report them, and phase shifts the consumption wobble so several meters
+    don't report identical values.
+    """
+    samples = []
+    flow_energy = gen_energy = 0.0
+    for index in range(count):
+        gen_power = max(0.0, 4000 * math.sin(math.pi * index / count))
+        con_power = 1500 + 500 * math.sin(index / 50 + phase)
+        flow_power = abs(con_power - gen_power)
+        flow_energy += flow_power * interval / 3_600_000
+        gen_energy += gen_power * interval / 3_600_000
+        samples.append((
+            gen_power / VOLTAGE, con_power / VOLTAGE, flow_power, round(flow_energy, 3), gen_power, round(gen_energy, 3),
+            start + index * interval,
+        ))
+    return samples
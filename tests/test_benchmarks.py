@@ -0,0 +1,110 @@
+"""Benchmarks of the per-calculation hot path, run with pytest-benchmark.
+
+Every case benchmarks a whole solar day of samples, so the timings include
+the crossover and rollover branches. Skip them with ``--benchmark-skip``.
+"""
+from __future__ import annotations
+
+from datetime import date, timezone
+
+import numpy as np
+import pytest
+
+from roys_net_meter.calculator import NetMeterCalculator
+from roys_net_meter.quality import CounterFilter
+from roys_net_meter.rollups import NetMeterRollups
+from roys_net_meter.series import align_inputs, calculate_energy, filter_counter
+from roys_net_meter.stats import NetMeterStats
+from roys_net_meter.tariff import TariffSchedule
+from roys_net_meter.trace_buffer import TRACE_COLUMNS, NetMeterTrace
+
+pytest.importorskip('pytest_benchmark')
+
+
+def test_calculate(benchmark, day: list[tuple[float, ...]]) -> None:
+    """Timestamped calculations with the crossover interpolation."""
+
+    def run() -> NetMeterCalculator:
+        calculator = NetMeterCalculator()
+        calculator.seed(day[0][3], day[0][5])
+        update = calculator.update
+        for sample in day:
+            update(*sample)
+        return calculator
+
+    assert benchmark(run).sensors.consumption_energy > 0
+
+
+def test_calculate_with_tariffs(benchmark, day: list[tuple[float, ...]]) -> None:
+    """Timestamped calculations that also accumulate the energy per tariff."""
+
+    def run() -> NetMeterCalculator:
+        calculator = NetMeterCalculator()
+        calculator.tariffs = TariffSchedule(range(17, 21), range(7, 17), [date(2026, 12, 25)], timezone.utc)
+        calculator.seed(day[0][3], day[0][5])
+        update = calculator.update
+        for sample in day:
+            update(*sample)
+        return calculator
+
+    assert benchmark(run).tariff_sensors.off_peak_consumption_energy > 0
+
+
+def test_counter_filter(benchmark, day: list[tuple[float, ...]]) -> None:
+    """Filtering the flow energy readings."""
+    readings = [(sample[3], sample[6]) for sample in day]
+
+    def run() -> float:
+        counter = CounterFilter(NetMeterStats())
+        reading = 0.0
+        for raw, timestamp in readings:
+            reading = counter.filter(raw, timestamp)
+        return reading
+
+    assert benchmark(run) == pytest.approx(day[-1][3])
+
+
+def test_rollups(benchmark, day: list[tuple[float, ...]]) -> None:
+    """Updating the hourly and daily rollups."""
+    rows = [(sample[6], sample[2], 0.0, sample[3], 0.0, sample[5]) for sample in day]
+
+    def run() -> NetMeterRollups:
+        rollups = NetMeterRollups()
+        update = rollups.update
+        for row in rows:
+            update(*row)
+        return rollups
+
+    assert benchmark(run).daily_peak_import_power > 0
+
+
+def test_trace_record(benchmark, day: list[tuple[float, ...]]) -> None:
+    """Recording the inputs and outputs of every calculation."""
+    rows = [(sample[6], *sample[:6], *sample[:6]) for sample in day]
+    trace = NetMeterTrace(1024)
+    record = trace.record
+    assert len(rows[0]) == len(TRACE_COLUMNS)
+
+    def run() -> None:
+        for row in rows:
+            record(row)
+
+    benchmark(run)
+    assert len(trace) == 1024
+
+
+def test_backfill_series(benchmark, day: list[tuple[float, ...]]) -> None:
+    """Filtering, aligning and calculating a day of recorded inputs like the backfill does."""
+    samples = np.array(day)
+    series = [(samples[:, 6], samples[:, column]) for column in range(6)]
+
+    def run() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        filtered = list(series)
+        for column in (3, 5):
+            times, values = series[column]
+            filtered[column] = times, filter_counter(times, values, NetMeterStats())
+        _timeline, columns = align_inputs(filtered)
+        return calculate_energy(columns)
+
+    consumption, _imported, _exported = benchmark(run)
+    assert consumption[-1] > 0
@@ -0,0 +1,109 @@
+"""Tests of the net metering calculations."""
+from __future__ import annotations
+
+import pytest
+
+from roys_net_meter.calculator import NetMeterCalculator, NetMeterSample
+
+
+def seeded(flow_energy: float = 0.0, gen_energy: float = 0.0) -> NetMeterCalculator:
+    """Return a calculator seeded with the given meter readings."""
+    calculator = NetMeterCalculator()
+    calculator.seed(flow_energy, gen_energy)
+    return calculator
+
+
+def test_import() -> None:
+    """Consumption above generation imports the flow."""
+    calculator = seeded(10.0, 5.0)
+    calculator.update(2.0, 6.0, 900.0, 10.5, 500.0, 5.25)
+    sensors = calculator.sensors
+    assert sensors.import_power == 900.0
+    assert sensors.export_power == 0
+    assert sensors.consumption_power == 1400.0
+    assert sensors.import_energy == pytest.approx(0.5)
+    assert sensors.export_energy == 0
+    assert sensors.consumption_energy == pytest.approx(0.75)
+
+
+def test_export() -> None:
+    """Generation above consumption exports the flow."""
+    calculator = seeded(10.0, 5.0)
+    calculator.update(6.0, 2.0, 900.0, 10.5, 1400.0, 6.0)
+    sensors = calculator.sensors
+    assert sensors.export_power == 900.0
+    assert sensors.import_power == 0
+    assert sensors.consumption_power == 500.0
+    assert sensors.export_energy == pytest.approx(0.5)
+    assert sensors.import_energy == 0
+    assert sensors.consumption_energy == pytest.approx(0.5)
+
+
+def test_transient_carry() -> None:
+    """Export while the generation reading is flat is carried until it changes."""
+    calculator = seeded(10.0, 5.0)
+    calculator.update(6.0, 2.0, 900.0, 10.1, 1400.0, 5.0)
+    assert calculator.sensors.consumption_energy == 0
+    assert calculator.state.transient_flow_energy == pytest.approx(-0.1)
+    calculator.update(6.0, 2.0, 900.0, 10.2, 1400.0, 5.5)
+    assert calculator.state.transient_flow_energy == 0
+    assert calculator.sensors.consumption_energy == pytest.approx(0.3)
+    assert calculator.sensors.export_energy == pytest.approx(0.2)
+
+
+def test_crossover_split() -> None:
+    """A flow energy delta spanning a crossover is split by the integrated power."""
+    calculator = seeded()
+    calculator.update(2.0, 6.0, 1000.0, 0.0, 0.0, 0.0, 0.0)
+    calculator.update(2.0, 6.0, 1000.0, 0.0, 0.0, 0.0, 10.0)
+    # The power crosses zero halfway between the samples, so 12500 Ws were
+    # imported and 2500 Ws exported while the delta accumulated.
+    calculator.update(6.0, 2.0, 1000.0, 0.012, 0.0, 0.002, 20.0)
+    sensors = calculator.sensors
+    assert sensors.import_energy == pytest.approx(0.01)
+    assert sensors.export_energy == pytest.approx(0.002)
+    assert sensors.consumption_energy == pytest.approx(0.002 + 0.01 - 0.002)
+    assert calculator.state.import_area == calculator.state.export_area == 0
+
+
+def test_crossover_without_timestamps() -> None:
+    """Without timestamps the whole delta goes to the direction of the latest sample."""
+    calculator = seeded()
+    calculator.update(2.0, 6.0, 1000.0, 0.0, 0.0, 0.0)
+    calculator.update(6.0, 2.0, 1000.0, 0.012, 0.0, 0.002)
+    assert calculator.sensors.import_energy == 0
+    assert calculator.sensors.export_energy == pytest.approx(0.012)
+
+
+def test_energy_balance(day: list[tuple[float, ...]]) -> None:
+    """Consumption is generation plus import minus export over a day."""
+    calculator = NetMeterCalculator()
+    output = list(calculator.replay(NetMeterSample(*sample) for sample in day))[-1]
+    generation = day[-1][5] - day[0][5]
+    carry = calculator.state.transient_flow_energy
+    assert output.consumption_energy == pytest.approx(generation + output.import_energy - output.export_energy + carry)
+    assert output.import_energy + output.export_energy == pytest.approx(day[-1][3] - day[0][3])
+
+
+def test_seed_resets_integration() -> None:
+    """Seeding again drops the power integrated against the previous readings."""
+    calculator = seeded()
+    calculator.update(2.0, 6.0, 1000.0, 0.0, 0.0, 0.0, 0.0)
+    calculator.update(2.0, 6.0, 1000.0, 0.0, 0.0, 0.0, 10.0)
+    calculator.seed(5.0, 1.0)
+    assert calculator.state.import_area == 0
+    assert calculator.state.last_timestamp is None
+
+
+def test_reactive() -> None:
+    """Reactive energy follows the direction of the real power."""
+    calculator = NetMeterCalculator()
+    calculator.seed(0.0, 0.0, 1.0)
+    calculator.update_reactive(True, 300.0, 400.0, 1.5)
+    sensors = calculator.sensors
+    assert sensors.reactive_export_power == 400.0
+    assert sensors.reactive_export_energy == pytest.approx(0.5)
+    assert sensors.reactive_import_energy == 0
+    assert sensors.power_factor == pytest.approx(0.6)
+    calculator.update_reactive(False, 0.0, 0.0, 1.5)
+    assert sensors.power_factor == 1.0
@@ -0,0 +1,110 @@
+"""Tests of the config and options flows and of applying the options. Needs Home Assistant."""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from roys_net_meter.standalone import INTEGRATION_PATH
+
+pytest.importorskip('homeassistant')
+
+from roys_net_meter.standalone import import_integration  # noqa: E402
+
+import_integration()
+
+from homeassistant.const import CONF_NAME  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator  # noqa: E402
+from pytest_homeassistant_custom_component.common import MockConfigEntry  # noqa: E402
+
+from roys_net_meter import async_update_options, config_flow  # noqa: E402
+from roys_net_meter.const import (  # noqa: E402
+    CONF_EXTERNAL_STATISTICS,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_PEAK_HOURS,
+    CONF_POWER_DEADBAND,
+    CONF_UPDATE_MODE,
+    DATA_KEY_API,
+    DATA_KEY_COORDINATOR,
+    DATA_KEY_SCHEDULER,
+    DOMAIN,
+    FLOW_ENERGY_ENTITY,
+    INPUT_ENTITIES,
+    UPDATE_MODE_POLL,
+    RoysNetMeter,
+)
+from roys_net_meter.scheduler import NetMeterScheduler  # noqa: E402
+
+ERRORS = ('reactive_incomplete', 'entity_not_found', 'wrong_unit', 'max_below_min', 'invalid_holidays', 'inputs_not_ready', 'already_configured')
+STRINGS = json.loads((INTEGRATION_PATH / 'strings.json').read_text(encoding='utf-8'))
+
+
+def test_translations_match_strings() -> None:
+    """The English translations are the strings."""
+    assert json.loads((INTEGRATION_PATH / 'translations' / 'en.json').read_text(encoding='utf-8')) == STRINGS
+
+
+@pytest.mark.parametrize(('flow', 'step', 'extra'), [('config', 'user', {'name'}), ('options', 'init', set())])
+def test_fields_and_errors_are_translated(flow: str, step: str, extra: set[str]) -> None:
+    """Every field of the form and every error it can show has a translation."""
+    strings = STRINGS[flow]
+    fields = {str(key) for key in config_flow._meter_schema({})} | extra
+    assert set(strings['step'][step]['data']) == fields
+    assert set(strings['error']) >= set(ERRORS)
+
+
+@pytest.fixture(name='entry')
+def entry_fixture(hass: HomeAssistant) -> MockConfigEntry:
+    """Return the config entry of a running meter whose inputs import 1 kW."""
+    data = {CONF_NAME: 'Meter'}
+    for key, value in zip(INPUT_ENTITIES, (2.0, 6.0, 1000.0, 10.0, 500.0, 5.0)):
+        data[key] = f'sensor.{key}'
+        hass.states.async_set(data[key], str(value))
+    entry = MockConfigEntry(domain=DOMAIN, data=data, unique_id=data[FLOW_ENERGY_ENTITY])
+    entry.add_to_hass(hass)
+    api = RoysNetMeter(*(data[key] for key in INPUT_ENTITIES), hass)
+    assert api.try_start()
+    api.sensors.import_energy = 12.5
+    coordinator = DataUpdateCoordinator(hass, logging.getLogger(__name__), name='Meter')
+    hass.data[DOMAIN] = {
+        DATA_KEY_SCHEDULER: NetMeterScheduler(hass),
+        entry.entry_id: {DATA_KEY_API: api, DATA_KEY_COORDINATOR: coordinator},
+    }
+    return entry
+
+
+async def test_update_options_live(hass: HomeAssistant, entry: MockConfigEntry) -> None:
+    """Inputs and publish options are swapped into the running meter, keeping its totals."""
+    hass.states.async_set('sensor.new_flow_energy', '20.0')
+    options = {
+        **entry.data,
+        FLOW_ENERGY_ENTITY: 'sensor.new_flow_energy',
+        CONF_POWER_DEADBAND: 25.0,
+        CONF_UPDATE_MODE: UPDATE_MODE_POLL,
+        CONF_MIN_UPDATE_INTERVAL: 2.0,
+    }
+    hass.config_entries.async_update_entry(entry, options=options)
+    await async_update_options(hass, entry)
+    api = hass.data[DOMAIN][entry.entry_id][DATA_KEY_API]
+    assert api.flow_energy_entity == 'sensor.new_flow_energy'
+    assert api.power_deadband == 25.0
+    assert api.sensors.import_energy == 12.5
+    scheduler = hass.data[DOMAIN][DATA_KEY_SCHEDULER]
+    meter = scheduler._meters[entry.entry_id]
+    assert (meter.update_mode, meter.min_interval) == (UPDATE_MODE_POLL, 2.0)
+    scheduler.async_remove(entry.entry_id)
+
+
+@pytest.mark.parametrize('options', [{CONF_PEAK_HOURS: ['17', '18']}, {CONF_EXTERNAL_STATISTICS: True}])
+async def test_update_options_reload(hass: HomeAssistant, entry: MockConfigEntry, options: dict[str, Any]) -> None:
+    """Options that add or remove sensors reload the entry."""
+    hass.config_entries.async_update_entry(entry, options={**entry.data, **options})
+    with patch.object(hass.config_entries, 'async_reload', AsyncMock()) as reload:
+        await async_update_options(hass, entry)
+        await hass.async_block_till_done()
+    reload.assert_awaited_once_with(entry.entry_id)
+    assert entry.entry_id not in hass.data[DOMAIN][DATA_KEY_SCHEDULER]._meters
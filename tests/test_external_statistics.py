@@ -0,0 +1,93 @@
+"""Tests of the hourly external statistics of the energy totals. Needs Home Assistant."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip('homeassistant')
+
+from freezegun.api import FrozenDateTimeFactory  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.storage import Store  # noqa: E402
+
+from roys_net_meter.const import DOMAIN, ENERGY_KEYS, STORAGE_VERSION, RoysNetMeter  # noqa: E402
+from roys_net_meter.external_statistics import async_track_external_statistics, external_statistic_id  # noqa: E402
+
+INPUTS = ('gen_amp', 'con_amp', 'flow_power', 'flow_energy', 'gen_power', 'gen_energy')
+STORAGE_KEY = f'{DOMAIN}.entry'
+
+
+def set_inputs(hass: HomeAssistant, flow_energy: float) -> None:
+    """Set the inputs of a meter that imports 1 kW and generates nothing."""
+    for name, value in zip(INPUTS, (2.0, 6.0, 1000.0, flow_energy, 0.0, 5.0)):
+        hass.states.async_set(f'sensor.{name}', str(value))
+
+
+async def started_meter(hass: HomeAssistant) -> RoysNetMeter:
+    """Return a meter with external statistics, restored from the store."""
+    api = RoysNetMeter(*(f'sensor.{name}' for name in INPUTS), hass)
+    api.signal = f'{DOMAIN}_result_entry'
+    api.external_statistics = True
+    await api.async_restore(Store(hass, STORAGE_VERSION, STORAGE_KEY))
+    assert api.try_start()
+    return api
+
+
+def added_hours(add: Any) -> dict[str, list[tuple[datetime, float]]]:
+    """Return the hours and sums added per statistic ID."""
+    added = {}
+    for (_hass, metadata, statistics), _kwargs in add.call_args_list:
+        added.setdefault(metadata['statistic_id'], []).extend((row['start'], row['sum']) for row in statistics)
+    return added
+
+
+async def test_hours_are_added_when_crossed(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """The totals an hour ended with are added once a calculation crosses into the next one."""
+    freezer.move_to('2026-06-21 10:59:00+00:00')
+    set_inputs(hass, 10.0)
+    api = await started_meter(hass)
+    with patch('roys_net_meter.external_statistics.async_add_external_statistics') as add:
+        unsub = async_track_external_statistics(hass, api, 'entry', 'Meter')
+        await api.perform_calculations()
+        freezer.move_to('2026-06-21 10:59:50+00:00')
+        set_inputs(hass, 10.5)
+        await api.perform_calculations()
+        assert not add.called
+        freezer.move_to('2026-06-21 11:00:20+00:00')
+        set_inputs(hass, 10.75)
+        await api.perform_calculations()
+        unsub()
+    statistic_id = external_statistic_id('entry', 'import_energy')
+    # The energy counted in the calculation that crossed belongs to the new hour
+    assert added_hours(add)[statistic_id] == [(datetime(2026, 6, 21, 10, tzinfo=timezone.utc), 0.5)]
+    assert api.sensors.import_energy == 0.75
+    assert len(add.call_args_list) == len(ENERGY_KEYS)
+
+
+async def test_hours_passed_while_stopped(hass: HomeAssistant, hass_storage: dict[str, Any], freezer: FrozenDateTimeFactory) -> None:
+    """Hours that passed while stopped are added with the totals the meter stopped with."""
+    hass_storage[STORAGE_KEY] = {
+        'version': STORAGE_VERSION,
+        'key': STORAGE_KEY,
+        'data': {
+            'consumption_energy': 3.0,
+            'import_energy': 2.0,
+            'export_energy': 1.0,
+            'transient_flow_energy': 0.0,
+            'open_hour': datetime(2026, 6, 21, 11, tzinfo=timezone.utc).timestamp(),
+        },
+    }
+    freezer.move_to('2026-06-21 14:10:00+00:00')
+    set_inputs(hass, 10.0)
+    api = await started_meter(hass)
+    with patch('roys_net_meter.external_statistics.async_add_external_statistics') as add:
+        unsub = async_track_external_statistics(hass, api, 'entry', 'Meter')
+        await api.perform_calculations()
+        unsub()
+    assert added_hours(add)[external_statistic_id('entry', 'import_energy')] == [
+        (datetime(2026, 6, 21, hour, tzinfo=timezone.utc), 2.0) for hour in (11, 12, 13)
+    ]
+    assert api.open_hour == datetime(2026, 6, 21, 14, tzinfo=timezone.utc).timestamp()
@@ -0,0 +1,58 @@
+"""Tests of the snapshot of the input states. Needs Home Assistant."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fake_hass import FakeHass
+
+pytest.importorskip('homeassistant')
+
+from homeassistant.exceptions import ConfigEntryNotReady  # noqa: E402
+
+from roys_net_meter.const import InputSnapshot  # noqa: E402
+
+ENTITY_IDS = ['sensor.gen_amp', 'sensor.con_amp', 'sensor.flow_power']
+START = datetime(2026, 6, 21, tzinfo=timezone.utc)
+
+
+@pytest.fixture(name='hass')
+def hass_fixture() -> FakeHass:
+    """Return a FakeHass with a state for every input."""
+    hass = FakeHass()
+    for index, entity_id in enumerate(ENTITY_IDS):
+        hass.states.async_set(entity_id, float(index), START)
+    return hass
+
+
+def test_refresh_counts_changed_inputs(hass: FakeHass) -> None:
+    """Only the inputs whose state changed are parsed again."""
+    inputs = InputSnapshot(ENTITY_IDS)
+    assert inputs.refresh(hass) == 3
+    assert inputs.values == [0.0, 1.0, 2.0]
+    assert inputs.refresh(hass) == 0
+    later = START + timedelta(seconds=5)
+    hass.states.async_set('sensor.con_amp', 4.5, later)
+    assert inputs.refresh(hass) == 1
+    assert inputs.values == [0.0, 4.5, 2.0]
+    assert inputs.timestamp == later.timestamp()
+    assert inputs.updated_at()['sensor.con_amp'] == later.isoformat()
+
+
+def test_refresh_unavailable(hass: FakeHass) -> None:
+    """A missing or unparsable input means the inputs are not ready."""
+    inputs = InputSnapshot([*ENTITY_IDS, 'sensor.missing'])
+    with pytest.raises(ConfigEntryNotReady):
+        inputs.refresh(hass)
+    inputs = InputSnapshot(ENTITY_IDS)
+    hass.states.async_set('sensor.flow_power', 'unavailable', START + timedelta(seconds=1))
+    with pytest.raises(ConfigEntryNotReady):
+        inputs.refresh(hass)
+
+
+def test_oldest_report(hass: FakeHass) -> None:
+    """Without the time states were reported the oldest report is unknown."""
+    inputs = InputSnapshot(ENTITY_IDS)
+    inputs.refresh(hass)
+    assert inputs.oldest_report() is None
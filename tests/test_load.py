@@ -0,0 +1,144 @@
+"""Load benchmark of the calculate and publish hot path with many meters.
+
+Every meter is a real RoysNetMeter with its six RoysNetMeterSensor entities,
+running against the FakeHass state machine. Each simulated tick sets the
+inputs of all meters from a solar day profile, then calculates and publishes
+them the way the scheduler does, handing the result snapshots to the
+listeners directly instead of through the dispatcher. State writes are
+counted instead of being sent to Home Assistant. The ticks per second, the
+allocations per tick and the state writes per simulated hour are reported in
+the extra info of the benchmark. Needs Home Assistant.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import sys
+from time import perf_counter
+import tracemalloc
+
+import pytest
+
+from fake_hass import FakeCoordinator, FakeHass
+from profiles import solar_day
+
+pytest.importorskip('pytest_benchmark')
+pytest.importorskip('homeassistant')
+
+from homeassistant.helpers.entity import Entity  # noqa: E402
+
+from roys_net_meter.standalone import import_integration  # noqa: E402
+
+INPUTS = ('gen_amp', 'con_amp', 'flow_power', 'flow_energy', 'gen_power', 'gen_energy')
+METERS = 10
+RATE = 2.0
+HOURS = 1.0
+START = datetime(2026, 6, 21, tzinfo=timezone.utc)
+
+
+class SimulatedMeter:
+    """One meter with its input entities, profile and sensors."""
+
+    def __init__(self, hass: FakeHass, index: int, count: int) -> None:
+        """Initialize."""
+        from roys_net_meter.const import SENSOR_TYPES, RoysNetMeter
+        from roys_net_meter.sensor import RoysNetMeterResultListener, RoysNetMeterSensor
+
+        self.entity_ids = [f'sensor.meter_{index}_{name}' for name in INPUTS]
+        self.samples = solar_day(count, interval=1 / RATE, phase=index)
+        self.api = RoysNetMeter(*self.entity_ids, hass)
+        self.api.set_result_paths([f'{description.source}.{description.key}' for description in SENSOR_TYPES])
+        self.listener = RoysNetMeterResultListener(self.api)
+        coordinator = FakeCoordinator()
+        self.sensors = [
+            RoysNetMeterSensor(self.api, coordinator, f'Meter {index}', f'meter_{index}', description, self.listener)
+            for description in SENSOR_TYPES
+        ]
+        for entity in self.sensors:
+            self.listener.add(entity)
+
+    def set_inputs(self, hass: FakeHass, tick: int) -> None:
+        """Set the input states of a tick."""
+        now = START + timedelta(seconds=tick / RATE)
+        for entity_id, value in zip(self.entity_ids, self.samples[tick]):
+            hass.states.async_set(entity_id, value, now)
+
+    async def tick(self) -> None:
+        """Calculate the meter and publish it if it changed."""
+        if await self.api.perform_calculations():
+            self.listener(self.api.update_result())
+
+
+@pytest.fixture(name='hass')
+def hass_fixture(monkeypatch: pytest.MonkeyPatch) -> FakeHass:
+    """Return a FakeHass that counts the state writes of the entities."""
+    import_integration()
+    hass = FakeHass()
+
+    def count_write(entity: Entity) -> None:
+        """Count a state write instead of writing it."""
+        hass.bus.state_writes += 1
+
+    monkeypatch.setattr(Entity, 'async_write_ha_state', count_write)
+    return hass
+
+
+def test_load(benchmark, hass: FakeHass) -> None:
+    """Calculate and publish a simulated hour of several meters."""
+    count = int(RATE * HOURS * 3600)
+    meters = [SimulatedMeter(hass, index, count) for index in range(METERS)]
+    loop = asyncio.new_event_loop()
+    for meter in meters:
+        meter.set_inputs(hass, 0)
+        loop.run_until_complete(meter.api.authenticate())
+    # The last ticks are traced for their transient allocations. Tracing slows
+    # everything down, so they are not timed.
+    traced = min(count // 10, 1000)
+    ticks = iter(range(1, count - traced))
+    timed = [0, 0.0]
+
+    def setup() -> tuple[tuple[int], dict]:
+        """Set the inputs of the next tick outside the timing."""
+        tick = next(ticks)
+        for meter in meters:
+            meter.set_inputs(hass, tick)
+        return (tick,), {}
+
+    def run(_tick: int) -> None:
+        """Calculate and publish all meters."""
+        began = perf_counter()
+        for meter in meters:
+            loop.run_until_complete(meter.tick())
+        timed[0] += 1
+        timed[1] += perf_counter() - began
+
+    blocks = sys.getallocatedblocks()
+    benchmark.pedantic(run, setup=setup, rounds=count - traced - 1, iterations=1)
+    retained_blocks = sys.getallocatedblocks() - blocks
+    meter_ticks = METERS * timed[0]
+    elapsed = timed[1]
+
+    peak = 0
+    tracemalloc.start()
+    for tick in range(count - traced, count):
+        for meter in meters:
+            meter.set_inputs(hass, tick)
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        run(tick)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    loop.close()
+
+    benchmark.extra_info.update({
+        'meters': METERS,
+        'meter ticks per second': meter_ticks / elapsed,
+        'retained blocks per meter tick': retained_blocks / meter_ticks,
+        'peak transient bytes per tick': peak,
+        'state writes per simulated hour': hass.bus.state_writes / HOURS,
+        'state writes per meter and hour': hass.bus.state_writes / HOURS / METERS,
+    })
+    assert hass.bus.state_writes > 0
+    # The power sensors of a meter change with every tick at most.
+    assert hass.bus.state_writes <= count * METERS * 6
+    assert all(meter.api.sensors.consumption_energy > 0 for meter in meters)
@@ -0,0 +1,80 @@
+"""Tests of the energy counter filter."""
+from __future__ import annotations
+
+import pytest
+
+from roys_net_meter.quality import CounterFilter
+from roys_net_meter.stats import NetMeterStats
+
+
+@pytest.fixture(name='stats')
+def stats_fixture() -> NetMeterStats:
+    """Return empty statistics."""
+    return NetMeterStats()
+
+
+def test_rising(stats: NetMeterStats) -> None:
+    """Plausible readings pass through unchanged."""
+    counter = CounterFilter(stats)
+    assert counter.filter(100.0, 0.0) == 100.0
+    assert counter.filter(100.5, 60.0) == 100.5
+    assert counter.filter(100.5, 120.0) == 100.5
+
+
+def test_glitch_held_and_counted_once(stats: NetMeterStats) -> None:
+    """A small drop is held, and reporting it again is not another glitch."""
+    counter = CounterFilter(stats)
+    counter.filter(10.0, 0.0)
+    for timestamp in range(1, 6):
+        assert counter.filter(9.995, timestamp) == 10.0
+    assert stats.negative_glitches == 1
+    assert counter.filter(10.1, 10.0) == 10.1
+
+
+def test_reset_keeps_new_reading(stats: NetMeterStats) -> None:
+    """A counter that starts over from zero continues on top of the last reading."""
+    counter = CounterFilter(stats)
+    counter.filter(950.0, 0.0)
+    assert counter.filter(3.0, 10.0) == 953.0
+    assert counter.filter(4.0, 60.0) == 954.0
+    assert stats.counter_resets == 1
+    assert stats.counter_rollovers == 0
+
+
+def test_rollover(stats: NetMeterStats) -> None:
+    """A counter that wraps at a power of ten continues past it."""
+    counter = CounterFilter(stats)
+    counter.filter(99999.5, 0.0)
+    assert counter.filter(0.2, 3600.0) == pytest.approx(100000.2)
+    assert stats.counter_rollovers == 1
+
+
+def test_implausible_rollover_is_reset(stats: NetMeterStats) -> None:
+    """A drop near a power of ten that counts too much energy across it is a reset."""
+    counter = CounterFilter(stats)
+    counter.filter(950.0, 0.0)
+    assert counter.filter(3.0, 60.0) == 953.0
+    assert stats.counter_rollovers == 0
+    assert stats.counter_resets == 1
+
+
+def test_impossible_jump_held_and_counted_once(stats: NetMeterStats) -> None:
+    """A jump faster than the plausible power is held, and counted once."""
+    counter = CounterFilter(stats)
+    counter.filter(10.0, 0.0)
+    for timestamp in range(1, 6):
+        assert counter.filter(500.0, timestamp) == 10.0
+    assert stats.impossible_deltas == 1
+    # The spike went away
+    assert counter.filter(10.001, 7.0) == 10.001
+    assert stats.counter_resets == 0
+
+
+def test_jump_followed_by_counting(stats: NetMeterStats) -> None:
+    """A jump the counter keeps counting from becomes the new level."""
+    counter = CounterFilter(stats)
+    counter.filter(10.0, 0.0)
+    assert counter.filter(500.0, 1.0) == 10.0
+    assert counter.filter(500.01, 2.0) == pytest.approx(10.01)
+    assert stats.impossible_deltas == 1
+    assert stats.counter_resets == 1
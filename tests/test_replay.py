@@ -0,0 +1,58 @@
+"""Tests of the offline replay of recorded traces."""
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from roys_net_meter.calculator import NetMeterCalculator, NetMeterSample
+from roys_net_meter.replay import INPUTS, calculate, filter_counters, long_samples, read_records, thin, wide_samples
+from roys_net_meter.stats import NetMeterStats
+
+
+def wide_csv(samples: list[tuple[float, ...]]) -> io.StringIO:
+    """Return the samples as a wide CSV trace."""
+    lines = [','.join(('timestamp', *INPUTS))]
+    lines += [','.join(map(str, (sample[6], *sample[:6]))) for sample in samples]
+    return io.StringIO('\n'.join(lines))
+
+
+def test_wide_replay_matches_calculator(day: list[tuple[float, ...]]) -> None:
+    """Replaying a wide trace gives the totals of the calculator."""
+    stats = NetMeterStats()
+    series = list(calculate(filter_counters(wide_samples(read_records(wide_csv(day), 'csv'), stats), stats), stats))
+    calculator = NetMeterCalculator()
+    expected = list(calculator.replay(NetMeterSample(*sample) for sample in day))[-1]
+    assert series[-1][1] == pytest.approx(expected)
+    assert stats.calculations == len(day)
+    assert stats.parse_failures == 0
+
+
+def test_unparsable_records_are_skipped() -> None:
+    """Records that are not numbers are counted and skipped."""
+    stats = NetMeterStats()
+    trace = io.StringIO('timestamp,' + ','.join(INPUTS) + '\n0,unavailable,1,1,1,1,1\n1,1,1,1,1,1,1\n')
+    assert len(list(wide_samples(read_records(trace, 'csv'), stats))) == 1
+    assert stats.parse_failures == 1
+
+
+def test_long_samples() -> None:
+    """State changes give a sample once every input had a value."""
+    entities = {name: f"sensor.{name}" for name in INPUTS}
+    records = [
+        {'entity_id': f"sensor.{name}", 'state': str(index), 'last_changed': f"2026-01-01T00:00:0{index}+00:00"}
+        for index, name in enumerate(INPUTS)
+    ]
+    records.append({'entity_id': 'sensor.gen_amp', 'state': '9', 'last_changed': '2026-01-01T00:00:09+00:00'})
+    trace = io.StringIO('\n'.join(json.dumps(record) for record in records))
+    samples = list(long_samples(read_records(trace, 'jsonl'), entities, NetMeterStats()))
+    assert len(samples) == 2
+    assert samples[0][:6] == (0.0, 1.0, 2.0, 3.0, 4.0, 5.0)
+    assert samples[1].gen_amp == 9.0
+
+
+def test_thin() -> None:
+    """At most one row per interval is kept, and always the last one."""
+    series = [(float(timestamp), None) for timestamp in range(10)]
+    assert [timestamp for timestamp, _output in thin(series, 4)] == [0.0, 4.0, 8.0, 9.0]
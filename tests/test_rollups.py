@@ -0,0 +1,55 @@
+"""Tests of the hourly and daily rollups."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from roys_net_meter.rollups import NetMeterRollups
+
+TIME_ZONE = timezone(timedelta(hours=10))
+MIDNIGHT = datetime(2026, 6, 21, tzinfo=TIME_ZONE).timestamp()
+
+
+@pytest.fixture(name='rollups')
+def rollups_fixture() -> NetMeterRollups:
+    """Return rollups in a time zone ahead of UTC."""
+    return NetMeterRollups(time_zone=TIME_ZONE)
+
+
+def test_peaks_roll_over(rollups: NetMeterRollups) -> None:
+    """Hourly peaks start over every hour, daily peaks at local midnight."""
+    rollups.update(MIDNIGHT + 10, 3000.0, 0.0, 0.0, 0.0, 0.0)
+    rollups.update(MIDNIGHT + 3599, 1000.0, 500.0, 0.0, 0.0, 0.0)
+    assert rollups.hourly_peak_import_power == 3000.0
+    assert rollups.hourly_peak_export_power == 500.0
+    rollups.update(MIDNIGHT + 3600, 2000.0, 0.0, 0.0, 0.0, 0.0)
+    assert rollups.hourly_peak_import_power == 2000.0
+    assert rollups.hourly_peak_export_power == 0.0
+    assert rollups.daily_peak_import_power == 3000.0
+    assert rollups.daily_peak_export_power == 500.0
+    rollups.update(MIDNIGHT + 86400, 100.0, 0.0, 0.0, 0.0, 0.0)
+    assert rollups.daily_peak_import_power == 100.0
+    assert rollups.daily_peak_export_power == 0.0
+
+
+def test_ratios(rollups: NetMeterRollups) -> None:
+    """Self-consumption and coverage are shares of today's energy."""
+    rollups.update(MIDNIGHT + 10, 0.0, 0.0, 100.0, 20.0, 50.0)
+    rollups.update(MIDNIGHT + 20, 0.0, 0.0, 108.0, 21.0, 54.0)
+    # 4 kWh generated, 1 kWh of it exported, 8 kWh consumed
+    assert rollups.self_consumption_ratio == pytest.approx(75.0)
+    assert rollups.solar_coverage == pytest.approx(37.5)
+    rollups.update(MIDNIGHT + 86400, 0.0, 0.0, 109.0, 21.0, 54.0)
+    assert rollups.self_consumption_ratio == 0.0
+    assert rollups.day_consumption_energy == pytest.approx(1.0)
+
+
+def test_rebaseline(rollups: NetMeterRollups) -> None:
+    """The first sample after a rebaseline adds no energy."""
+    rollups.update(MIDNIGHT + 10, 0.0, 0.0, 100.0, 20.0, 50.0)
+    rollups.update(MIDNIGHT + 20, 0.0, 0.0, 101.0, 20.0, 51.0)
+    rollups.rebaseline()
+    rollups.update(MIDNIGHT + 30, 0.0, 0.0, 101.0, 20.0, 7.0)
+    rollups.update(MIDNIGHT + 40, 0.0, 0.0, 102.0, 20.0, 8.0)
+    assert rollups.day_generation_energy == pytest.approx(2.0)
@@ -0,0 +1,152 @@
+"""Tests of the shared scheduling of the meters. Needs Home Assistant."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+
+import pytest
+
+pytest.importorskip('homeassistant')
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator  # noqa: E402
+
+from roys_net_meter import scheduler as scheduler_module  # noqa: E402
+from roys_net_meter.const import UPDATE_MODE_POLL, UPDATE_MODE_PUSH, RoysNetMeter  # noqa: E402
+from roys_net_meter.scheduler import NetMeterScheduler, ScheduledMeter  # noqa: E402
+
+INPUTS = ('gen_amp', 'con_amp', 'flow_power', 'flow_energy', 'gen_power', 'gen_energy')
+
+
+class Clock:
+    """Monotonic clock and timer of the scheduler, moved forward by hand."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.now = 1000.0
+        self.timer: tuple[float, Callable] | None = None
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+    def call_later(self, _hass: HomeAssistant, delay: float, action: Callable) -> Callable[[], None]:
+        """Set the timer, return a callback to cancel it."""
+        timer = self.timer = self.now + delay, action
+
+        def cancel() -> None:
+            """Cancel the timer unless it was replaced."""
+            if self.timer is timer:
+                self.timer = None
+
+        return cancel
+
+    async def advance(self, seconds: float) -> None:
+        """Move the clock forward and run the timer if it became due."""
+        self.now += seconds
+        if self.timer is not None and self.timer[0] <= self.now:
+            _at, action = self.timer
+            self.timer = None
+            await action(None)
+
+
+@pytest.fixture(name='clock')
+def clock_fixture(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    """Return the clock and timer the scheduler runs by."""
+    clock = Clock()
+    monkeypatch.setattr(scheduler_module, 'monotonic', clock)
+    monkeypatch.setattr(scheduler_module, 'async_call_later', clock.call_later)
+    return clock
+
+
+def scheduled_meter(hass: HomeAssistant, name: str, update_mode: str = UPDATE_MODE_PUSH) -> ScheduledMeter:
+    """Return a started meter whose inputs import 1 kW."""
+    values = (2.0, 6.0, 1000.0, 10.0, 500.0, 5.0)
+    for input_name, value in zip(INPUTS, values):
+        hass.states.async_set(f'sensor.{name}_{input_name}', str(value))
+    api = RoysNetMeter(*(f'sensor.{name}_{input_name}' for input_name in INPUTS), hass)
+    assert api.try_start()
+    coordinator = DataUpdateCoordinator(hass, logging.getLogger(__name__), name=name)
+    return ScheduledMeter(api, coordinator, update_mode, coalesce_interval=1.0, min_interval=0.5, max_interval=8.0)
+
+
+async def test_push_changes_are_coalesced(hass: HomeAssistant, clock: Clock) -> None:
+    """Changes within the coalesce interval lead to one calculation of all meters together."""
+    scheduler = NetMeterScheduler(hass)
+    first, second = scheduled_meter(hass, 'first'), scheduled_meter(hass, 'second')
+    scheduler.async_add('first', first)
+    scheduler.async_add('second', second)
+    await clock.advance(0)
+    assert first.api.stats.calculations == second.api.stats.calculations == 1
+    assert first.ready is second.ready is None
+
+    await clock.advance(2)
+    for flow_power in ('1100.0', '1200.0', '1300.0'):
+        hass.states.async_set('sensor.first_flow_power', flow_power)
+        await hass.async_block_till_done()
+    hass.states.async_set('sensor.second_flow_power', '900.0')
+    await hass.async_block_till_done()
+    assert first.ready == second.ready == clock.now + 1.0
+
+    await clock.advance(0.5)
+    assert first.api.stats.calculations == 1
+    await clock.advance(0.5)
+    assert first.api.stats.calculations == second.api.stats.calculations == 2
+    assert first.api.sensors.import_power == 1300.0
+    scheduler.async_remove('first')
+    scheduler.async_remove('second')
+
+
+async def test_push_waits_for_the_interval(hass: HomeAssistant, clock: Clock) -> None:
+    """A change right after a calculation waits for the adaptive interval."""
+    scheduler = NetMeterScheduler(hass)
+    meter = scheduled_meter(hass, 'meter')
+    meter.coalesce_interval = 0.0
+    scheduler.async_add('meter', meter)
+    await clock.advance(0)
+    hass.states.async_set('sensor.meter_flow_power', '1100.0')
+    await hass.async_block_till_done()
+    assert meter.ready == meter.due == clock.now + meter.interval
+    await clock.advance(meter.interval)
+    assert meter.api.stats.calculations == 2
+    scheduler.async_remove('meter')
+
+
+async def test_poll_meters_stay_ready(hass: HomeAssistant, clock: Clock) -> None:
+    """Poll mode meters are calculated every interval without changes."""
+    scheduler = NetMeterScheduler(hass)
+    meter = scheduled_meter(hass, 'meter', UPDATE_MODE_POLL)
+    scheduler.async_add('meter', meter)
+    await clock.advance(0)
+    assert meter.ready == clock.now + meter.interval
+    await clock.advance(meter.interval)
+    assert meter.api.stats.calculations == 1
+    assert meter.api.stats.skipped_calculations == 1
+    scheduler.async_remove('meter')
+
+
+async def test_adaptive_interval(hass: HomeAssistant) -> None:
+    """The interval doubles while the inputs are steady and drops back when they move."""
+    meter = scheduled_meter(hass, 'meter')
+    meter.interval = meter.min_interval
+    meter.last_flow_power = 1000.0
+    intervals = []
+    for _calculation in range(6):
+        meter.adapt(True)
+        intervals.append(meter.interval)
+    assert intervals == [1.0, 2.0, 4.0, 8.0, 8.0, 8.0]
+
+    # The flow power changes quickly
+    meter.api.inputs.values[2] = 1500.0
+    meter.adapt(True)
+    assert meter.interval == meter.min_interval
+
+    # The amps are close to the crossover
+    meter.interval = meter.max_interval
+    meter.api.inputs.values[:2] = [5.5, 6.0]
+    meter.adapt(True)
+    assert meter.interval == meter.min_interval
+
+    # Calculations that were skipped since nothing changed don't hold it down
+    meter.adapt(False)
+    assert meter.interval == 2 * meter.min_interval
@@ -0,0 +1,177 @@
+"""Tests of the publishing of the sensor states. Needs Home Assistant."""
+from __future__ import annotations
+
+from datetime import timedelta
+import logging
+
+import pytest
+
+from fake_hass import FakeHass
+
+pytest.importorskip('homeassistant')
+
+from roys_net_meter.standalone import import_integration  # noqa: E402
+
+import_integration()
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.entity import Entity  # noqa: E402
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator  # noqa: E402
+from homeassistant.util import dt as dt_util  # noqa: E402
+from pytest_homeassistant_custom_component.common import async_fire_time_changed  # noqa: E402
+
+from roys_net_meter import sensor as sensor_module  # noqa: E402
+from roys_net_meter.const import SENSOR_TYPES, RoysNetMeter  # noqa: E402
+from roys_net_meter.sensor import RoysNetMeterResultListener, RoysNetMeterSensor  # noqa: E402
+
+INPUTS = ('gen_amp', 'con_amp', 'flow_power', 'flow_energy', 'gen_power', 'gen_energy')
+
+
+class RecordingEntity:
+    """Entity stand-in that counts the results handed to it."""
+
+    def __init__(self, result_index: int) -> None:
+        """Initialize."""
+        self.result_index = result_index
+        self.handled = 0
+
+    def async_handle_result(self) -> None:
+        """Count a handed result."""
+        self.handled += 1
+
+
+@pytest.fixture(name='api')
+def api_fixture() -> RoysNetMeter:
+    """Return a meter whose results hold the import and export power."""
+    api = RoysNetMeter(*(f'sensor.{name}' for name in INPUTS), FakeHass())
+    api.set_result_paths(['sensors.import_power', 'sensors.export_power'])
+    return api
+
+
+def test_listener_calls_changed_entities(api: RoysNetMeter) -> None:
+    """Only the entities whose value changed since the previous snapshot are called."""
+    listener = RoysNetMeterResultListener(api)
+    import_power, export_power = RecordingEntity(0), RecordingEntity(1)
+    listener.add(import_power)
+    listener.add(export_power)
+    api.sensors.import_power = 500.0
+    listener(api.update_result())
+    assert (import_power.handled, export_power.handled) == (1, 0)
+    listener(api.update_result())
+    assert (import_power.handled, export_power.handled) == (1, 0)
+    listener.remove(import_power)
+    api.sensors.import_power = 0.0
+    listener(api.update_result())
+    assert import_power.handled == 1
+
+
+def test_listener_after_unsent_snapshot(api: RoysNetMeter) -> None:
+    """A value that returns to the last sent one is handed on after a snapshot that was not sent."""
+    listener = RoysNetMeterResultListener(api)
+    entity = RecordingEntity(0)
+    listener.add(entity)
+    api.sensors.import_power = 500.0
+    listener(api.update_result())
+    # Like the recovery of the scheduler, which hands the snapshot to the
+    # entities through the coordinator
+    api.sensors.import_power = 700.0
+    api.update_result()
+    api.sensors.import_power = 500.0
+    listener(api.update_result())
+    assert entity.handled == 2
+
+
+
+class Clock:
+    """Monotonic clock the tests move forward by hand."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture(name='writes')
+def writes_fixture(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """Record the values of the state writes instead of writing them."""
+    writes = []
+    monkeypatch.setattr(Entity, 'async_write_ha_state', lambda entity: writes.append(entity.native_value))
+    return writes
+
+
+@pytest.fixture(name='clock')
+def clock_fixture(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    """Return the clock the sensors publish by."""
+    clock = Clock()
+    monkeypatch.setattr(sensor_module, 'monotonic', clock)
+    return clock
+
+
+def meter_sensors(hass: HomeAssistant) -> tuple[RoysNetMeter, dict[str, RoysNetMeterSensor]]:
+    """Return a meter and its sensors by key."""
+    api = RoysNetMeter(*(f'sensor.{name}' for name in INPUTS), hass)
+    api.set_result_paths([f'{description.source}.{description.key}' for description in SENSOR_TYPES])
+    coordinator = DataUpdateCoordinator(hass, logging.getLogger(__name__), name='Meter')
+    listener = RoysNetMeterResultListener(api)
+    sensors = {}
+    for description in SENSOR_TYPES:
+        entity = sensors[description.key] = RoysNetMeterSensor(api, coordinator, 'Meter', 'meter', description, listener)
+        entity.hass = hass
+    return api, sensors
+
+
+def publish(api: RoysNetMeter, sensor: RoysNetMeterSensor, value: float) -> None:
+    """Set the value of a sensor and hand the snapshot to it."""
+    setattr(api.sensors, sensor.entity_description.key, value)
+    api.update_result()
+    sensor.async_handle_result()
+
+
+async def test_power_deadband(hass: HomeAssistant, writes: list[float], clock: Clock) -> None:
+    """Power changes within the deadband are not written, energy changes are."""
+    api, sensors = meter_sensors(hass)
+    api.power_deadband = 50.0
+    publish(api, sensors['import_power'], 1000.0)
+    publish(api, sensors['import_power'], 1040.0)
+    publish(api, sensors['import_power'], 960.0)
+    publish(api, sensors['import_power'], 1060.0)
+    publish(api, sensors['import_energy'], 0.01)
+    publish(api, sensors['import_energy'], 0.02)
+    assert writes == [1000.0, 1060.0, 0.01, 0.02]
+    assert api.stats.suppressed_writes == 2
+    assert api.stats.published_writes == 4
+
+
+async def test_min_publish_interval(hass: HomeAssistant, writes: list[float], clock: Clock) -> None:
+    """Changes within the minimum publish interval are written once it has passed."""
+    api, sensors = meter_sensors(hass)
+    api.min_publish_interval = 10.0
+    import_power = sensors['import_power']
+    publish(api, import_power, 1000.0)
+    clock.now += 4
+    publish(api, import_power, 1100.0)
+    publish(api, import_power, 1200.0)
+    assert writes == [1000.0]
+    assert api.stats.suppressed_writes == 2
+    clock.now += 6
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=6))
+    await hass.async_block_till_done()
+    # The latest value is written, once
+    assert writes == [1000.0, 1200.0]
+    clock.now += 11
+    publish(api, import_power, 1300.0)
+    assert writes == [1000.0, 1200.0, 1300.0]
+
+
+async def test_unavailable_is_written_right_away(hass: HomeAssistant, writes: list[float], clock: Clock) -> None:
+    """A change of the availability is written within the minimum publish interval."""
+    api, sensors = meter_sensors(hass)
+    api.min_publish_interval = 10.0
+    import_power = sensors['import_power']
+    publish(api, import_power, 1000.0)
+    import_power.coordinator.last_update_success = False
+    import_power.async_handle_result()
+    assert len(writes) == 2
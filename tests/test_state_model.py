@@ -0,0 +1,120 @@
+"""Benchmark of the per-tick cost of the calculation state model.
+
+Compares the nested old/new/transient/stale dicts the calculations used to
+keep against NetMeterCalculator and its slotted dataclasses from
+``model.py``. Both run the same arithmetic on the same samples, so the
+difference is the cost of the state model alone.
+"""
+from __future__ import annotations
+
+from operator import attrgetter
+from types import SimpleNamespace
+
+import pytest
+
+from profiles import solar_day
+from roys_net_meter.calculator import NetMeterCalculator
+from roys_net_meter.model import NetMeterSensors
+
+pytest.importorskip('pytest_benchmark')
+
+# The samples without their timestamps, the dict model has no crossover split.
+SAMPLES = [sample[:6] for sample in solar_day(20_000)]
+
+
+def make_dict_state() -> tuple[dict, dict, dict, dict]:
+    """Build the nested dicts the way RoysNetMeter.__init__ used to."""
+    old_state = {'power': {'flow': 0, 'generation': 0, 'consumption': 0}, 'energy': {'flow': 0, 'generation': 0, 'consumption': 0, 'import': 0, 'export': 0}}
+    stale_state = {'energy': {'flow': 0}}
+    transient_state = {'power': {'flow': 0, 'generation': 0, 'consumption': 0}, 'energy': {'flow': 0, 'generation': 0, 'consumption': 0}}
+    new_state = {
+        'power': {'flow': 0, 'generation': 0, 'consumption': 0},
+        'energy': {'flow': 0, 'generation': 0, 'consumption': 0},
+        'sensors': {'consumption_energy': 0, 'import_energy': 0, 'export_energy': 0, 'consumption_power': 0, 'import_power': 0, 'export_power': 0},
+    }
+    return old_state, new_state, transient_state, stale_state
+
+
+def tick_dicts(old_state, new_state, transient_state, sample) -> None:
+    """One calculation on the nested dicts (the previous perform_calculations)."""
+    gen_amp, con_amp, raw_flow_power, flow_energy, gen_power, gen_energy = sample
+    if gen_amp > con_amp:
+        flow_power = -1*raw_flow_power
+        new_state['sensors']['consumption_power'] = gen_power + flow_power
+        new_state['sensors']['import_power'] = 0
+        new_state['sensors']['export_power'] = -1*flow_power
+        old_state['power']['consumption'] = new_state['sensors']['consumption_power']
+        old_state['power']['generation'] = gen_power
+        old_state['power']['flow'] = flow_power
+        if gen_energy == old_state['energy']['generation']:
+            transient_state['energy']['flow'] = transient_state['energy']['flow'] - (flow_energy - old_state['energy']['flow'])
+        else:
+            new_state['sensors']['consumption_energy'] = old_state['energy']['consumption'] + ((gen_energy - old_state['energy']['generation']) - (flow_energy - old_state['energy']['flow'])) + transient_state['energy']['flow']
+            transient_state['energy']['flow'] = 0
+            old_state['energy']['consumption'] = new_state['sensors']['consumption_energy']
+        new_state['sensors']['export_energy'] = old_state['energy']['export'] + (flow_energy - old_state['energy']['flow'])
+        old_state['energy']['export'] = new_state['sensors']['export_energy']
+        old_state['energy']['flow'] = flow_energy
+        old_state['energy']['generation'] = gen_energy
+    else:
+        flow_power = raw_flow_power
+        new_state['sensors']['consumption_power'] = gen_power + flow_power
+        new_state['sensors']['import_power'] = flow_power
+        new_state['sensors']['export_power'] = 0
+        old_state['power']['consumption'] = new_state['sensors']['consumption_power']
+        old_state['power']['generation'] = gen_power
+        old_state['power']['flow'] = flow_power
+        if transient_state['energy']['flow'] == 0:
+            new_state['sensors']['consumption_energy'] = old_state['energy']['consumption'] + (gen_energy - old_state['energy']['generation']) + (flow_energy - old_state['energy']['flow'])
+        else:
+            if abs((gen_energy - old_state['energy']['generation']) + (flow_energy - old_state['energy']['flow'])) > abs(transient_state['energy']['flow']):
+                new_state['sensors']['consumption_energy'] = old_state['energy']['consumption'] + (gen_energy - old_state['energy']['generation']) + (flow_energy - old_state['energy']['flow']) + transient_state['energy']['flow']
+                transient_state['energy']['flow'] = 0
+        new_state['sensors']['import_energy'] = old_state['energy']['import'] + (flow_energy - old_state['energy']['flow'])
+        old_state['energy']['consumption'] = new_state['sensors']['consumption_energy']
+        old_state['energy']['import'] = new_state['sensors']['import_energy']
+        old_state['energy']['flow'] = flow_energy
+        old_state['energy']['generation'] = gen_energy
+
+
+def run_dicts() -> dict:
+    """Run the samples on the nested dicts."""
+    old_state, new_state, transient_state, _stale_state = make_dict_state()
+    for sample in SAMPLES:
+        tick_dicts(old_state, new_state, transient_state, sample)
+    return new_state
+
+
+def run_slots() -> NetMeterSensors:
+    """Run the samples on the calculator."""
+    calculator = NetMeterCalculator()
+    update = calculator.update
+    for sample in SAMPLES:
+        update(*sample)
+    return calculator.sensors
+
+
+def test_state_models_agree() -> None:
+    """Both state models calculate the same sensor values."""
+    new_state, sensors = run_dicts(), run_slots()
+    for key, value in new_state['sensors'].items():
+        assert getattr(sensors, key) == value, key
+
+
+@pytest.mark.parametrize('run', [run_dicts, run_slots], ids=['nested_dicts', 'slotted_dataclasses'])
+def test_tick(benchmark, run) -> None:
+    """A day of calculations."""
+    benchmark(run)
+
+
+@pytest.mark.parametrize('model', ['nested_dicts', 'slotted_dataclasses'])
+def test_sensor_read(benchmark, model: str) -> None:
+    """Reading a sensor value the way native_value does."""
+    # Stand-ins for RoysNetMeterSensor with the attributes native_value reads.
+    api = SimpleNamespace(new_state=run_dicts(), sensors=run_slots())
+    entity = SimpleNamespace(api=api, entity_description=SimpleNamespace(key='export_energy'), _value=attrgetter('export_energy'))
+    if model == 'nested_dicts':
+        value = benchmark(lambda: round(entity.api.new_state['sensors'][entity.entity_description.key], 2))
+    else:
+        value = benchmark(lambda: round(entity._value(entity.api.sensors), 2))
+    assert value == round(api.sensors.export_energy, 2)
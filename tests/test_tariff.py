@@ -0,0 +1,76 @@
+"""Tests of the time-of-use tariff schedule."""
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+
+import pytest
+
+from roys_net_meter.calculator import NetMeterCalculator
+from roys_net_meter.tariff import TARIFF_OFF_PEAK, TARIFF_PEAK, TARIFF_SHOULDER, TARIFFS, TariffSchedule, parse_holidays
+
+# 2024-01-01 is a Monday
+MONDAY = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def at(day: int, hour: int, minute: int = 0, second: int = 0) -> float:
+    """Return the timestamp of a time in the first week of 2024."""
+    return MONDAY.replace(day=day, hour=hour, minute=minute, second=second).timestamp()
+
+
+@pytest.fixture(name='schedule')
+def schedule_fixture() -> TariffSchedule:
+    """Return a schedule with peak from 17 to 21, shoulder from 7 to 17 and a holiday on Tuesday."""
+    return TariffSchedule(['17', '18', '19', '20'], range(7, 17), [date(2024, 1, 2)], timezone.utc)
+
+
+@pytest.mark.parametrize(
+    ('timestamp', 'tariff'),
+    [
+        (at(1, 6, 59, 59), TARIFF_OFF_PEAK),
+        (at(1, 7), TARIFF_SHOULDER),
+        (at(1, 16, 59, 59), TARIFF_SHOULDER),
+        (at(1, 17), TARIFF_PEAK),
+        (at(1, 20, 59, 59), TARIFF_PEAK),
+        (at(1, 21), TARIFF_OFF_PEAK),
+        (at(2, 18), TARIFF_OFF_PEAK),
+        (at(6, 18), TARIFF_OFF_PEAK),
+        (at(3, 18), TARIFF_PEAK),
+    ],
+)
+def test_tariff_at(schedule: TariffSchedule, timestamp: float, tariff: str) -> None:
+    """Weekday hours follow the schedule, weekends and holidays are off-peak."""
+    assert TARIFFS[schedule.tariff_at(timestamp)] == tariff
+
+
+def test_cached_hour(schedule: TariffSchedule) -> None:
+    """The tariff of the current hour is reused until the hour ends."""
+    assert TARIFFS[schedule.tariff_at(at(1, 16, 30))] == TARIFF_SHOULDER
+    assert TARIFFS[schedule.tariff_at(at(1, 16, 59, 59))] == TARIFF_SHOULDER
+    assert TARIFFS[schedule.tariff_at(at(1, 17))] == TARIFF_PEAK
+    assert TARIFFS[schedule.tariff_at(at(1, 16, 59))] == TARIFF_SHOULDER
+
+
+def test_parse_holidays() -> None:
+    """Holidays are a comma separated list of ISO dates."""
+    assert parse_holidays(' 2026-12-25, 2026-12-26,') == {date(2026, 12, 25), date(2026, 12, 26)}
+    assert parse_holidays('') == frozenset()
+    with pytest.raises(ValueError):
+        parse_holidays('25/12/2026')
+
+
+def test_tariff_totals(schedule: TariffSchedule, day: list[tuple[float, ...]]) -> None:
+    """The energy of every tariff adds up to the totals."""
+    calculator = NetMeterCalculator()
+    calculator.tariffs = schedule
+    start = at(1, 0)
+    for sample in day:
+        if not calculator.seeded:
+            calculator.seed(sample[3], sample[5])
+        calculator.update(*sample[:6], start + sample[6])
+    sensors = calculator.sensors
+    tariff_sensors = calculator.tariff_sensors
+    for kind in ('consumption', 'import', 'export'):
+        total = sum(getattr(tariff_sensors, f"{tariff}_{kind}_energy") for tariff in TARIFFS)
+        assert total == pytest.approx(getattr(sensors, f"{kind}_energy"))
+    assert tariff_sensors.off_peak_import_energy > 0
+    assert tariff_sensors.peak_export_energy > 0
@@ -0,0 +1,60 @@
+"""Tests of the trace of the latest calculations."""
+from __future__ import annotations
+
+import io
+
+from roys_net_meter.trace_buffer import TRACE_COLUMNS, NetMeterTrace, write_trace
+
+
+def record(trace: NetMeterTrace, *timestamps: float) -> None:
+    """Record a row per timestamp."""
+    for timestamp in timestamps:
+        trace.record((timestamp,) + (0.0,) * (len(TRACE_COLUMNS) - 1))
+
+
+def test_since() -> None:
+    """The rows from a timestamp on are returned oldest first."""
+    trace = NetMeterTrace(10)
+    record(trace, 1.0, 2.0, 3.0)
+    assert len(trace) == 3
+    assert trace.since(2.0)[:, 0].tolist() == [2.0, 3.0]
+    assert trace.since(4.0).shape == (0, len(TRACE_COLUMNS))
+
+
+def test_wraps_around() -> None:
+    """The oldest rows are overwritten once the trace is full."""
+    trace = NetMeterTrace(5)
+    record(trace, *range(8))
+    assert len(trace) == 5
+    assert trace.since(0.0)[:, 0].tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert trace.since(5.5)[:, 0].tolist() == [6.0, 7.0]
+
+
+def test_timestamps_going_back() -> None:
+    """Rows of swapped inputs with older timestamps are kept in recording order."""
+    trace = NetMeterTrace(5)
+    record(trace, 10.0, 11.0, 12.0, 5.0, 6.0, 7.0, 13.0)
+    assert trace.since(11.5)[:, 0].tolist() == [12.0, 5.0, 6.0, 7.0, 13.0]
+    trace = NetMeterTrace(10)
+    record(trace, 10.0, 11.0, 12.0, 5.0)
+    assert trace.since(11.5)[:, 0].tolist() == [12.0, 5.0]
+
+
+def test_since_copies() -> None:
+    """The returned rows are not changed by later recordings."""
+    trace = NetMeterTrace(2)
+    record(trace, 1.0, 2.0)
+    rows = trace.since(0.0)
+    record(trace, 3.0, 4.0)
+    assert rows[:, 0].tolist() == [1.0, 2.0]
+
+
+def test_write_trace() -> None:
+    """The traces of the meters are written as CSV rows keyed by config entry ID."""
+    trace = NetMeterTrace(3)
+    record(trace, 1.0, 2.0)
+    file = io.StringIO()
+    write_trace(file, {'abc': trace.since(0.0)})
+    lines = file.getvalue().splitlines()
+    assert lines[0] == ','.join(('config_entry_id', *TRACE_COLUMNS))
+    assert [line.split(',')[:2] for line in lines[1:]] == [['abc', '1.0'], ['abc', '2.0']]